@@ -1,6 +1,6 @@
 {
     'name': 'Universal Attendance Gateway',
-    'version': '18.0.1.0.0',
+    'version': '18.0.1.1.0',
     'category': 'Human Resources/Attendances',
     'summary': 'Connect any attendance device with Odoo Attendance module',
     'description': """
@@ -1,49 +1,136 @@
 from .base_adapter import BaseAttendanceAdapter
 from odoo.exceptions import UserError
 from odoo import _
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import requests
 import logging
+import time
 
 _logger = logging.getLogger(__name__)
 
+# HTTP/2 (multiplexed requests over one TLS connection) when httpx and h2 are installed
+try:
+    import httpx
+    import h2  # noqa: F401
+except ImportError:
+    httpx = None
+
+# Process-wide sessions keyed by API base URL so keep-alive connections
+# survive across adapter instances (one adapter is built per sync).
+_SESSIONS = {}
+
+# Gateway errors worth retrying, with exponential backoff between attempts.
+# Only idempotent methods are retried: a POST/DELETE the device applied
+# before failing must not run twice.
+_RETRY_STATUSES = (502, 503, 504)
+_RETRY_METHODS = frozenset({'HEAD', 'GET'})
+_RETRY_TOTAL = 3
+_RETRY_BACKOFF = 0.3
+
+# Connection test answers that mean "try the next probe" rather than offline
+_PROBE_FALLBACK_STATUSES = (404, 405, 501)
+
+# (connect, read) timeouts in seconds
+if httpx is not None:
+    _TIMEOUT = httpx.Timeout(25.0, connect=5.0)
+    _REQUEST_ERRORS = (httpx.HTTPError, ValueError)
+else:
+    _TIMEOUT = (5, 25)
+    _REQUEST_ERRORS = (requests.exceptions.RequestException, ValueError)
+
 class RestAPIAdapter(BaseAttendanceAdapter):
     """Generic REST API adapter"""
     
     def __init__(self, device):
         super().__init__(device)
-        self.session = requests.Session()
-        
+        key = (device.api_url or '').rstrip('/')
+        self.session = _SESSIONS.get(key)
+        if self.session is None:
+            self.session = _SESSIONS.setdefault(key, self._build_session())
+
+        # Credentials are sent per request so devices can share a pooled session
+        self.headers = {}
         if device.api_key:
-            self.session.headers.update({
-                'Authorization': f'Bearer {device.api_key}'
-            })
-        
+            self.headers['Authorization'] = f'Bearer {device.api_key}'
+
+        self.auth = None
         if device.username and device.password:
-            self.session.auth = (device.username, device.password)
+            self.auth = (device.username, device.password)
+
+    @staticmethod
+    def _build_session():
+        """Create a session with a tuned connection pool"""
+        if httpx is not None:
+            return httpx.Client(transport=httpx.HTTPTransport(
+                http2=True,
+                retries=3,
+                limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+            ))
+
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=32,
+            pool_maxsize=64,
+            max_retries=Retry(
+                total=_RETRY_TOTAL,
+                backoff_factor=_RETRY_BACKOFF,
+                status_forcelist=_RETRY_STATUSES,
+                allowed_methods=_RETRY_METHODS,
+                raise_on_status=False,
+            ),
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
     
     def _make_request(self, method, endpoint, **kwargs):
         """Make HTTP request"""
         url = f"{self.device.api_url.rstrip('/')}/{endpoint.lstrip('/')}"
-        
+
+        headers = dict(self.headers, **kwargs.pop('headers', {}))
+        kwargs.setdefault('auth', self.auth)
+        kwargs.setdefault('timeout', _TIMEOUT)
+
         try:
-            response = self.session.request(method, url, timeout=30, **kwargs)
+            response = self.session.request(method, url, headers=headers, **kwargs)
+            if httpx is not None and method in _RETRY_METHODS:
+                # httpx transports only retry failed connections; retry
+                # gateway errors here like urllib3's Retry does for requests
+                for attempt in range(_RETRY_TOTAL):
+                    if response.status_code not in _RETRY_STATUSES:
+                        break
+                    time.sleep(_RETRY_BACKOFF * (2 ** attempt))
+                    response = self.session.request(method, url, headers=headers, **kwargs)
             response.raise_for_status()
             return response.json() if response.content else {}
-        except requests.exceptions.RequestException as e:
+        except _REQUEST_ERRORS as e:
             _logger.error(f"API request failed: {str(e)}")
             raise UserError(_("API request failed: %s") % str(e))
     
-    def test_connection(self):
-        """Test API connection"""
-        try:
-            self._make_request('GET', '/health')
-            return True
-        except:
+    def test_connection(self, timeout=3):
+        """Test API connection with single, unretried probes"""
+        # Probe outside the pooled session so its retries and backoff never
+        # stretch the test past timeout; one connection error means offline
+        base_url = self.device.api_url.rstrip('/')
+        client = httpx if httpx is not None else requests
+
+        # HEAD skips the response body; fall back to GET only when the
+        # device answers that the probe is unsupported or not found
+        for method, endpoint in (('HEAD', '/health'), ('GET', '/health'), ('GET', '/')):
             try:
-                self._make_request('GET', '/')
+                response = client.request(
+                    method, f"{base_url}{endpoint}",
+                    headers=self.headers, auth=self.auth, timeout=timeout,
+                )
+            except _REQUEST_ERRORS as e:
+                _logger.warning(f"API connection test failed: {str(e)}")
+                return False
+            if response.status_code < 400:
                 return True
-            except:
+            if response.status_code not in _PROBE_FALLBACK_STATUSES:
                 return False
+        return False
     
     def get_attendance_logs(self, from_date=None, to_date=None):
         """Fetch attendance logs via API"""
@@ -55,30 +142,22 @@ class RestAPIAdapter(BaseAttendanceAdapter):
         
         data = self._make_request('GET', '/attendance/logs', params=params)
         
-        logs = []
-        for item in data.get('logs', []):
-            logs.append({
-                'device_user_id': str(item['user_id']),
-                'timestamp': item['timestamp'],
-                'punch_type': str(item.get('type', '0')),
-                'raw_data': item
-            })
-        
-        return logs
+        return [{
+            'device_user_id': str(item['user_id']),
+            'timestamp': item['timestamp'],
+            'punch_type': str(item.get('type', '0')),
+            'raw_data': item
+        } for item in data.get('logs', [])]
     
     def get_users(self):
         """Fetch users via API"""
         data = self._make_request('GET', '/users')
         
-        users = []
-        for item in data.get('users', []):
-            users.append({
-                'device_user_id': str(item['id']),
-                'name': item.get('name', ''),
-                'card_number': item.get('card', '')
-            })
-        
-        return users
+        return [{
+            'device_user_id': str(item['id']),
+            'name': item.get('name', ''),
+            'card_number': item.get('card', '')
+        } for item in data.get('users', [])]
     
     def push_user(self, device_user):
         """Push user via API"""
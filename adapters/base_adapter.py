@@ -1,44 +1,56 @@
-from abc import ABC, abstractmethod
-import pytz
+from datetime import timezone
+from zoneinfo import ZoneInfo
 import logging
 
+from ..models.attendance_shift import _standard_time
+
 _logger = logging.getLogger(__name__)
 
-class BaseAttendanceAdapter(ABC):
-    """Abstract base class for all attendance device adapters"""
+class BaseAttendanceAdapter:
+    """Base class for all attendance device adapters"""
     
     def __init__(self, device):
         self.device = device
         self.env = device.env
+        self._tz = ZoneInfo(device.timezone or 'UTC')
     
-    @abstractmethod
-    def test_connection(self):
-        """Test connection to device"""
-        pass
+    def test_connection(self, timeout=3):
+        """Test connection to device, giving up after timeout seconds"""
+        raise NotImplementedError
     
-    @abstractmethod
     def get_attendance_logs(self, from_date=None, to_date=None):
         """Fetch attendance logs from device"""
-        pass
+        raise NotImplementedError
+    
+    def get_attendance_log_pages(self, from_date=None, to_date=None, page_size=1000):
+        """
+        Yield attendance logs in lists of at most page_size.
+        Adapters that can read the device incrementally should override this.
+        """
+        logs = self.get_attendance_logs(from_date=from_date, to_date=to_date)
+        for start in range(0, len(logs), page_size):
+            yield logs[start:start + page_size]
     
-    @abstractmethod
     def get_users(self):
         """Fetch users from device"""
-        pass
+        raise NotImplementedError
     
-    @abstractmethod
     def push_user(self, device_user):
         """Push user to device"""
-        pass
+        raise NotImplementedError
+    
+    def push_users(self, device_users):
+        """Push several users to device"""
+        return all([self.push_user(device_user) for device_user in device_users])
     
-    @abstractmethod
     def delete_user(self, device_user_id):
         """Delete user from device"""
-        pass
+        raise NotImplementedError
     
     def normalize_timestamp(self, timestamp):
         """Convert device timestamp to UTC"""
-        device_tz = pytz.timezone(self.device.timezone)
         if timestamp.tzinfo is None:
-            timestamp = device_tz.localize(timestamp)
-        return timestamp.astimezone(pytz.UTC).replace(tzinfo=None)
\ No newline at end of file
+            # Same DST resolution as shift boundaries, so punches and
+            # thresholds convert identically in the repeated hour
+            timestamp = _standard_time(timestamp.replace(tzinfo=self._tz))
+        return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
\ No newline at end of file
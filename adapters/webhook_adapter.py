@@ -3,7 +3,7 @@ from .base_adapter import BaseAttendanceAdapter
 class WebhookAdapter(BaseAttendanceAdapter):
     """Webhook adapter - devices push data to us"""
     
-    def test_connection(self):
+    def test_connection(self, timeout=3):
         return True
     
     def get_attendance_logs(self, from_date=None, to_date=None):
@@ -5,6 +5,14 @@ import logging
 
 _logger = logging.getLogger(__name__)
 
+try:
+    from zk.exception import ZKError
+except ImportError:
+    ZKError = UserError
+
+# Failures that mean "device unreachable" rather than a bug in the adapter
+_CONNECTION_ERRORS = (UserError, OSError, ZKError)
+
 class ZKTecoAdapter(BaseAttendanceAdapter):
     """Adapter for ZKTeco devices"""
     
@@ -12,8 +20,20 @@ class ZKTecoAdapter(BaseAttendanceAdapter):
         super().__init__(device)
         self.zk = None
         self.conn = None
+        self._keep_alive = False
+
+    def __enter__(self):
+        """Hold one connection open for every call made inside the block"""
+        self._connect()
+        self._keep_alive = True
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._keep_alive = False
+        self._disconnect()
+        return False
     
-    def _connect(self):
+    def _connect(self, timeout=10):
         """Establish connection"""
         if self.conn:
             return self.conn
@@ -23,7 +43,7 @@ class ZKTecoAdapter(BaseAttendanceAdapter):
             self.zk = ZK(
                 self.device.ip_address,
                 port=self.device.port or 4370,
-                timeout=10,
+                timeout=timeout,
                 password=int(self.device.password or 0)
             )
             self.conn = self.zk.connect()
@@ -44,48 +64,68 @@ class ZKTecoAdapter(BaseAttendanceAdapter):
             finally:
                 self.conn = None
                 self.zk = None
+
+    def _release(self):
+        """Disconnect unless a `with` block owns the connection"""
+        if not self._keep_alive:
+            self._disconnect()
     
-    def test_connection(self):
+    def test_connection(self, timeout=3):
         """Test connection"""
         try:
-            conn = self._connect()
+            conn = self._connect(timeout=timeout)
             conn.get_firmware_version()
-            self._disconnect()
             return True
-        except:
-            self._disconnect()
+        except _CONNECTION_ERRORS as e:
+            _logger.info(f"ZKTeco connection test failed for {self.device.name}: {e}")
             return False
+        finally:
+            self._release()
     
     def get_attendance_logs(self, from_date=None, to_date=None):
         """Fetch attendance logs"""
-        logs = []
+        logs = [log for page in self.get_attendance_log_pages(from_date, to_date) for log in page]
+        _logger.info(f"Fetched {len(logs)} logs from {self.device.name}")
+        return logs
+
+    def get_attendance_log_pages(self, from_date=None, to_date=None, page_size=1000):
+        """
+        Yield attendance logs in lists of at most page_size.
+        pyzk transfers the device buffer in one buffered read; the connection
+        is released right after it so logs are normalized off the socket.
+        """
         try:
             conn = self._connect()
-            attendances = conn.get_attendance()
-            
-            for att in attendances:
-                if from_date and att.timestamp < from_date:
-                    continue
-                if to_date and att.timestamp > to_date:
-                    continue
-                
-                normalized_time = self.normalize_timestamp(att.timestamp)
-                
-                logs.append({
-                    'device_user_id': str(att.user_id),
-                    'timestamp': normalized_time,
-                    'punch_type': str(att.punch),
-                    'raw_data': {
-                        'status': att.status,
-                        'uid': att.uid,
-                    }
-                })
-            
-            _logger.info(f"Fetched {len(logs)} logs from {self.device.name}")
+            attendances = sorted(conn.get_attendance() or [], key=lambda a: a.timestamp)
         finally:
-            self._disconnect()
-        
-        return logs
+            self._release()
+
+        page = []
+        for att in attendances:
+            if from_date and att.timestamp < from_date:
+                continue
+            if to_date and att.timestamp > to_date:
+                break
+
+            page.append(self._log_from_attendance(att))
+            if len(page) >= page_size:
+                yield page
+                page = []
+
+        if page:
+            yield page
+
+    def _log_from_attendance(self, att):
+        """Convert a pyzk Attendance into the adapter log dict"""
+        return {
+            'device_user_id': str(att.user_id),
+            'timestamp': self.normalize_timestamp(att.timestamp),
+            'punch_type': str(att.punch),
+            'raw_data': {
+                'status': att.status,
+                'uid': att.uid,
+            }
+        }
     
     def get_users(self):
         """Fetch users"""
@@ -101,7 +141,7 @@ class ZKTecoAdapter(BaseAttendanceAdapter):
                     'card_number': str(user.card) if user.card else None,
                 })
         finally:
-            self._disconnect()
+            self._release()
         
         return users
     
@@ -120,7 +160,14 @@ class ZKTecoAdapter(BaseAttendanceAdapter):
             )
             return True
         finally:
-            self._disconnect()
+            self._release()
+    
+    def push_users(self, device_users):
+        """Push several users over one connection"""
+        with self:
+            for device_user in device_users:
+                self.push_user(device_user)
+        return True
     
     def delete_user(self, device_user_id):
         """Delete user from device"""
@@ -129,4 +176,4 @@ class ZKTecoAdapter(BaseAttendanceAdapter):
             conn.delete_user(uid=int(device_user_id))
             return True
         finally:
-            self._disconnect()
\ No newline at end of file
+            self._release()
\ No newline at end of file
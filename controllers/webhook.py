@@ -1,47 +1,116 @@
 from odoo import http, _
 from odoo.http import request
+from itertools import islice
+import io
 import json
 import logging
+import re
 
 _logger = logging.getLogger(__name__)
 
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _json_loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def _json_dumps(data):
+    return orjson.dumps(data).decode() if orjson is not None else json.dumps(data)
+
+
+def _json_response(data):
+    return request.make_response(_json_dumps(data), headers=[('Content-Type', 'application/json')])
+
+# Punches handed to the processor per batch
+_BATCH_SIZE = 1000
+
+# Largest accepted webhook body (bytes)
+_MAX_BODY_SIZE = 10 * 1024 * 1024
+
+_LOGS_ARRAY_RE = re.compile(rb'\s*\{\s*"logs"\s*:\s*\[')
+
+
+def _iter_payload_logs(body):
+    """
+    Iterate the log dicts of a webhook payload.
+    Accepts a list of logs, {"logs": [...]} or a single log dict.
+    Lists are decoded incrementally when ijson is installed.
+    """
+    if ijson is not None:
+        if body.lstrip()[:1] == b'[':
+            return ijson.items(io.BytesIO(body), 'item', use_float=True)
+        if _LOGS_ARRAY_RE.match(body):
+            return ijson.items(io.BytesIO(body), 'logs.item', use_float=True)
+
+    data = _json_loads(body)
+    if isinstance(data, dict):
+        return iter(data.get('logs', [data]))
+    if isinstance(data, list):
+        return iter(data)
+    return iter([])
+
+
 class AttendanceWebhookController(http.Controller):
     
-    @http.route('/attendance/webhook/<string:token>', type='json', auth='none', csrf=False, methods=['POST'])
+    @http.route('/attendance/webhook/<string:token>', type='http', auth='none', csrf=False, methods=['POST'])
     def receive_attendance(self, token, **kwargs):
         """Webhook endpoint to receive attendance data"""
+        # Shed bad requests before touching the database
+        httprequest = request.httprequest
+        if (httprequest.content_length or 0) > _MAX_BODY_SIZE:
+            return request.make_response('', status=413)
+        if httprequest.mimetype != 'application/json':
+            return request.make_response('', status=415)
+
+        # Cap what is actually read, so chunked bodies without a
+        # Content-Length are bounded too
+        body = httprequest.stream.read(_MAX_BODY_SIZE + 1)
+        if len(body) > _MAX_BODY_SIZE:
+            return request.make_response('', status=413)
+
         try:
             # Find device by token
-            device = request.env['attendance.device'].sudo().search([
-                ('webhook_token', '=', token),
-                ('state', '=', 'active')
-            ], limit=1)
-            
-            if not device:
-                return {'status': 'error', 'message': 'Invalid token'}
+            Device = request.env['attendance.device'].sudo()
+            device_id = Device._get_webhook_device_id(token)
             
-            # Get JSON data
-            data = request.jsonrequest
-            
-            # Process attendance data
-            logs = []
-            if isinstance(data, dict):
-                logs = data.get('logs', [data])
-            elif isinstance(data, list):
-                logs = data
+            if not device_id:
+                return _json_response({'status': 'error', 'message': 'Invalid token'})
+            device = Device.browse(device_id)
             
+            # Decode the body lazily and store punches in bounded batches;
+            # the queue cron processes them
+            logs = _iter_payload_logs(body)
             processor = request.env['attendance.processor'].sudo()
-            result = processor.process_raw_logs(device, logs)
+            queued = duplicates = failed = 0
+
+            while True:
+                batch = list(islice(logs, _BATCH_SIZE))
+                if not batch:
+                    break
+                result = processor.enqueue_raw_logs(device, batch)
+                queued += result['queued']
+                duplicates += result['duplicates']
+                failed += result['failed']
             
-            return {
-                'status': 'success',
-                'processed': result['processed'],
-                'failed': result['failed']
-            }
+            return _json_response({
+                'status': 'queued',
+                'count': queued,
+                'duplicates': duplicates,
+                'failed': failed
+            })
             
         except Exception as e:
             _logger.error(f"Webhook processing error: {str(e)}")
-            return {'status': 'error', 'message': str(e)}
+            return _json_response({'status': 'error', 'message': str(e)})
     
     @http.route('/attendance/webhook/<string:token>/test', type='http', auth='none', csrf=False, methods=['GET'])
     def test_webhook(self, token):
@@ -51,6 +120,6 @@ class AttendanceWebhookController(http.Controller):
         ], limit=1)
         
         if device:
-            return json.dumps({'status': 'ok', 'device': device.name})
+            return _json_dumps({'status': 'ok', 'device': device.name})
         else:
-            return json.dumps({'status': 'error', 'message': 'Invalid token'})
\ No newline at end of file
+            return _json_dumps({'status': 'error', 'message': 'Invalid token'})
\ No newline at end of file
@@ -0,0 +1,9 @@
+def migrate(cr, version):
+    """Flag attendances auto-closed before is_auto_closed existed"""
+    if not version:
+        return
+    cr.execute("""
+        UPDATE hr_attendance
+           SET is_auto_closed = TRUE
+         WHERE status = 'auto_closed'
+    """)
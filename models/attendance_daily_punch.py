@@ -4,6 +4,38 @@ import logging
 
 _logger = logging.getLogger(__name__)
 
+# (time field, raw log field) indexed by int(punch_type)
+_PUNCH_FIELDS = (
+    ('check_in_time', 'check_in_log_id'),
+    ('check_out_time', 'check_out_log_id'),
+    ('break_start_time', 'break_start_log_id'),
+    ('break_end_time', 'break_end_log_id'),
+    ('overtime_in_time', 'overtime_in_log_id'),
+    ('overtime_out_time', 'overtime_out_log_id'),
+)
+
+_PUNCH_TIME_FIELDS = [
+    'check_in_time', 'check_out_time',
+    'break_start_time', 'break_end_time',
+    'overtime_in_time', 'overtime_out_time',
+]
+
+
+def _get_punch_fields(punch_type):
+    """Return (time field, log field) for a punch type, or None if unknown"""
+    try:
+        index = int(punch_type)
+    except (TypeError, ValueError):
+        return None
+    return _PUNCH_FIELDS[index] if 0 <= index < len(_PUNCH_FIELDS) else None
+
+
+def _span_hours(start, end):
+    """Hours between two datetimes, 0.0 if either is missing"""
+    if start and end:
+        return (end - start).total_seconds() / 3600
+    return 0.0
+
 
 class AttendanceDailyPunch(models.Model):
     _name = 'attendance.daily.punch'
@@ -79,33 +111,20 @@ class AttendanceDailyPunch(models.Model):
          'Only one daily punch record per employee per day!')
     ]
 
-    @api.depends('check_in_time', 'check_out_time', 'break_start_time', 'break_end_time',
-                 'overtime_in_time', 'overtime_out_time')
+    @api.depends(*_PUNCH_TIME_FIELDS)
     def _compute_hours(self):
         for record in self:
-            work_hours = 0.0
-            break_hours = 0.0
-            overtime_hours = 0.0
-
-            # Calculate regular work hours
-            if record.check_in_time and record.check_out_time:
-                delta = record.check_out_time - record.check_in_time
-                work_hours = delta.total_seconds() / 3600
-
-            # Calculate break hours
-            if record.break_start_time and record.break_end_time:
-                delta = record.break_end_time - record.break_start_time
-                break_hours = delta.total_seconds() / 3600
-
-            # Calculate overtime hours
-            if record.overtime_in_time and record.overtime_out_time:
-                delta = record.overtime_out_time - record.overtime_in_time
-                overtime_hours = delta.total_seconds() / 3600
-
-            record.work_hours = work_hours
-            record.break_hours = break_hours
-            record.overtime_hours = overtime_hours
-            record.total_hours = work_hours - break_hours + overtime_hours
+            # Calculate regular work, break and overtime hours
+            work_hours = _span_hours(record.check_in_time, record.check_out_time)
+            break_hours = _span_hours(record.break_start_time, record.break_end_time)
+            overtime_hours = _span_hours(record.overtime_in_time, record.overtime_out_time)
+
+            record.update({
+                'work_hours': work_hours,
+                'break_hours': break_hours,
+                'overtime_hours': overtime_hours,
+                'total_hours': work_hours - break_hours + overtime_hours,
+            })
 
     @api.depends('check_in_time', 'check_out_time')
     def _compute_is_complete(self):
@@ -115,64 +134,100 @@ class AttendanceDailyPunch(models.Model):
     def get_filled_slot_ids(self):
         """Get list of slot IDs that have been filled today"""
         self.ensure_one()
-        filled = []
 
         if not self.shift_id or not self.shift_id.use_punch_slots:
-            return filled
+            return []
 
         # Map punch types to their slot IDs
+        punch_times = self.read(_PUNCH_TIME_FIELDS)[0]
+        filled = []
         for slot in self.shift_id.punch_slot_ids:
-            if slot.punch_type == '0' and self.check_in_time:
-                filled.append(slot.id)
-            elif slot.punch_type == '1' and self.check_out_time:
-                filled.append(slot.id)
-            elif slot.punch_type == '2' and self.break_start_time:
-                filled.append(slot.id)
-            elif slot.punch_type == '3' and self.break_end_time:
-                filled.append(slot.id)
-            elif slot.punch_type == '4' and self.overtime_in_time:
-                filled.append(slot.id)
-            elif slot.punch_type == '5' and self.overtime_out_time:
+            punch_fields = _get_punch_fields(slot.punch_type)
+            if punch_fields and punch_times[punch_fields[0]]:
                 filled.append(slot.id)
-
         return filled
 
     def record_punch(self, punch_type, timestamp, raw_log):
         """Record a punch for the specified type"""
         self.ensure_one()
 
-        field_map = {
-            '0': ('check_in_time', 'check_in_log_id'),
-            '1': ('check_out_time', 'check_out_log_id'),
-            '2': ('break_start_time', 'break_start_log_id'),
-            '3': ('break_end_time', 'break_end_log_id'),
-            '4': ('overtime_in_time', 'overtime_in_log_id'),
-            '5': ('overtime_out_time', 'overtime_out_log_id'),
-        }
-
-        if punch_type in field_map:
-            time_field, log_field = field_map[punch_type]
+        punch_fields = _get_punch_fields(punch_type)
+        if punch_fields:
+            time_field, log_field = punch_fields
             self.write({
                 time_field: timestamp,
                 log_field: raw_log.id
             })
 
+    def record_punches(self, punches):
+        """
+        Record several punches on this day in a single write.
+
+        Args:
+            punches: iterable of (punch_type, timestamp, raw_log) tuples;
+                     a later punch of the same type overrides an earlier one
+        """
+        self.ensure_one()
+
+        values = {}
+        for punch_type, timestamp, raw_log in punches:
+            punch_fields = _get_punch_fields(punch_type)
+            if punch_fields:
+                time_field, log_field = punch_fields
+                values[time_field] = timestamp
+                values[log_field] = raw_log.id
+
+        if values:
+            self.write(values)
+
     @api.model
     def get_or_create_daily_record(self, employee, punch_date, shift=None):
         """Get or create daily punch record for an employee"""
         if isinstance(punch_date, datetime):
             punch_date = punch_date.date()
 
-        record = self.search([
-            ('employee_id', '=', employee.id),
-            ('date', '=', punch_date)
-        ], limit=1)
+        records = self.get_or_create_daily_records([
+            (employee.id, punch_date, shift.id if shift else False)
+        ])
+        return records[(employee.id, punch_date)]
 
-        if not record:
-            record = self.create({
-                'employee_id': employee.id,
+    @api.model
+    def get_or_create_daily_records(self, pairs):
+        """
+        Batch version of get_or_create_daily_record.
+
+        Args:
+            pairs: iterable of (employee_id, date, shift_id) tuples
+
+        Returns:
+            dict: {(employee_id, date): record}
+        """
+        keys = {}
+        for employee_id, punch_date, shift_id in pairs:
+            if isinstance(punch_date, datetime):
+                punch_date = punch_date.date()
+            keys.setdefault((employee_id, punch_date), shift_id)
+
+        if not keys:
+            return {}
+
+        employee_ids = {key[0] for key in keys}
+        dates = {key[1] for key in keys}
+
+        # One search for every existing record, then filter the cross product in Python
+        existing = self.search([
+            ('employee_id', 'in', list(employee_ids)),
+            ('date', 'in', list(dates))
+        ])
+        by_key = {(rec.employee_id.id, rec.date): rec for rec in existing}
+
+        missing = [key for key in keys if key not in by_key]
+        if missing:
+            created = self.create([{
+                'employee_id': employee_id,
                 'date': punch_date,
-                'shift_id': shift.id if shift else False,
-            })
+                'shift_id': keys[(employee_id, punch_date)] or False,
+            } for employee_id, punch_date in missing])
+            by_key.update(zip(missing, created))
 
-        return record
\ No newline at end of file
+        return {key: by_key[key] for key in keys}
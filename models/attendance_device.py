@@ -1,11 +1,34 @@
-from odoo import models, fields, api, _
+from odoo import models, fields, api, tools, _
 from odoo.exceptions import UserError
+from .. import adapters
+from ..services.sync import sync_devices, MAX_SYNC_WORKERS
 from datetime import timedelta
+import functools
 import logging
+import pytz
 import re
+import secrets
 
 _logger = logging.getLogger(__name__)
 
+# Badge numbers embedded in device user names, e.g. "NN-60910013"
+_BADGE_RE = re.compile(r'\d{6,}')
+
+# device_type -> adapter class name in the adapters package
+_ADAPTER_MAP = {
+    'zkteco': 'ZKTecoAdapter',
+    'api_rest': 'RestAPIAdapter',
+    'webhook': 'WebhookAdapter',
+}
+
+
+_TZ_SELECTION = [(tz, tz) for tz in pytz.all_timezones]
+
+
+@functools.lru_cache(maxsize=None)
+def _resolve_adapter_class(class_name):
+    return getattr(adapters, class_name, None)
+
 
 class AttendanceDevice(models.Model):
     _name = 'attendance.device'
@@ -65,14 +88,17 @@ class AttendanceDevice(models.Model):
         ('error', 'Error'),
     ], string='Status', default='draft', tracking=True)
 
-    is_online = fields.Boolean(string='Online', compute='_compute_is_online')
+    is_online = fields.Boolean(string='Online', readonly=True, copy=False,
+                               help='Result of the last connection test or sync')
 
     # Timezone
     timezone = fields.Selection(selection='_get_timezones', string='Device Timezone', default='UTC', required=True)
 
     # Statistics
     total_users = fields.Integer(string='Total Users', compute='_compute_statistics')
-    total_logs = fields.Integer(string='Total Logs', compute='_compute_statistics')
+    total_logs = fields.Integer(string='Total Logs', compute='_compute_statistics',
+                                help='Number of raw logs, capped at the attendance_gateway.count_limit parameter')
+    total_logs_display = fields.Char(string='Total Logs', compute='_compute_statistics')
     last_log_date = fields.Datetime(string='Last Log Date', readonly=True)
 
     # Relations
@@ -88,57 +114,92 @@ class AttendanceDevice(models.Model):
 
     @api.model
     def _get_timezones(self):
-        import pytz
-        return [(tz, tz) for tz in pytz.all_timezones]
-
-    @api.model
-    def create(self, vals):
-        if vals.get('device_type') == 'webhook' and not vals.get('webhook_token'):
-            vals['webhook_token'] = self._generate_webhook_token()
-        return super().create(vals)
+        return _TZ_SELECTION
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            if vals.get('device_type') == 'webhook' and not vals.get('webhook_token'):
+                vals['webhook_token'] = self._generate_webhook_token()
+        return super().create(vals_list)
+
+    def write(self, vals):
+        # Only a real change of these fields can alter the webhook token lookup;
+        # syncs rewrite state='active' on every run
+        token_fields = [fname for fname in ('webhook_token', 'state', 'active') if fname in vals]
+        changed = any(record[fname] != vals[fname] for record in self for fname in token_fields)
+        res = super().write(vals)
+        if changed:
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
 
     def _generate_webhook_token(self):
-        import secrets
         return secrets.token_urlsafe(32)
 
+    @api.model
+    @tools.ormcache('token')
+    def _get_webhook_device_id(self, token):
+        """Active device id for a webhook token, cached per worker until devices change"""
+        device = self.sudo().search([
+            ('webhook_token', '=', token),
+            ('state', '=', 'active')
+        ], limit=1)
+        return device.id or None
+
     @api.depends('webhook_token')
     def _compute_webhook_url(self):
-        base_url = self.env['ir.config_parameter'].sudo().get_param('web.base.url')
+        # Only look up the base URL when some record actually has a token
+        base_url = self[:1].get_base_url() if any(self.mapped('webhook_token')) else ''
         for record in self: 
             if record.webhook_token:
                 record.webhook_url = f"{base_url}/attendance/webhook/{record.webhook_token}"
             else:
                 record.webhook_url = False
 
-    def _compute_is_online(self):
-        for record in self: 
-            record.is_online = False
-            if record.state == 'active':
-                try:
-                    adapter = record._get_adapter()
-                    record.is_online = adapter.test_connection()
-                except Exception: 
-                    pass
-
     def _compute_statistics(self):
+        count_limit = int(self.env['ir.config_parameter'].sudo().get_param(
+            'attendance_gateway.count_limit', 10000
+        ))
+
+        # One grouped count for users; raw logs are counted up to count_limit
+        # per device so huge log tables are never fully scanned
+        user_counts = dict(self.env['attendance.device.user']._read_group(
+            [('device_id', 'in', self.ids)], ['device_id'], ['__count']
+        ))
+        log_counts = {}
+        if self.ids:
+            self.env['attendance.raw.log'].flush_model(['device_id'])
+            self.env.cr.execute("""
+                SELECT d.id,
+                       (SELECT count(*) FROM (
+                            SELECT 1 FROM attendance_raw_log l
+                             WHERE l.device_id = d.id
+                             LIMIT %s
+                       ) capped)
+                  FROM unnest(%s) AS d(id)
+            """, (count_limit, self.ids))
+            log_counts = dict(self.env.cr.fetchall())
+
         for record in self: 
-            record.total_users = len(record.device_user_ids)
-            record.total_logs = self.env['attendance.raw.log'].search_count([('device_id', '=', record.id)])
+            record.total_users = user_counts.get(record, 0)
+            record.total_logs = log_counts.get(record.id, 0)
+            if record.total_logs >= count_limit:
+                record.total_logs_display = f"{count_limit}+"
+            else:
+                record.total_logs_display = str(record.total_logs)
 
     def _get_adapter(self):
         """Get device adapter"""
-        adapter_map = {
-            'zkteco': 'ZKTecoAdapter',
-            'api_rest': 'RestAPIAdapter',
-            'webhook': 'WebhookAdapter',
-        }
-
-        adapter_class_name = adapter_map.get(self.device_type)
+        adapter_class_name = _ADAPTER_MAP.get(self.device_type)
         if not adapter_class_name: 
             raise UserError(_("Unsupported device type: %s") % self.device_type)
 
-        from odoo.addons.hr_attendance_gateway import adapters
-        adapter_class = getattr(adapters, adapter_class_name, None)
+        adapter_class = _resolve_adapter_class(adapter_class_name)
 
         if not adapter_class:
             raise UserError(_("Adapter class %s not found") % adapter_class_name)
@@ -146,24 +207,27 @@ class AttendanceDevice(models.Model):
         return adapter_class(self)
 
     def action_test_connection(self):
-        """Test device connection"""
+        """Test device connection and store the result in is_online"""
         self.ensure_one()
         try:
-            adapter = self._get_adapter()
-            if adapter.test_connection():
-                return {
-                    'type': 'ir.actions.client',
-                    'tag': 'display_notification',
-                    'params': {
-                        'title': _('Success'),
-                        'message': _('Connection successful! '),
-                        'type': 'success',
-                    }
-                }
-            else:
-                raise UserError(_("Connection test failed"))
-        except Exception as e: 
-            raise UserError(_("Connection failed: %s") % str(e))
+            online = self._get_adapter().test_connection()
+            message = _('Connection successful! ') if online else _("Connection test failed")
+        except UserError as e:
+            online = False
+            message = _("Connection failed: %s") % str(e)
+
+        # Notify instead of raising so the stored status is not rolled back
+        self.is_online = online
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Success') if online else _('Connection Failed'),
+                'message': message,
+                'type': 'success' if online else 'danger',
+                'next': {'type': 'ir.actions.client', 'tag': 'soft_reload'},
+            }
+        }
 
     def action_sync_now(self):
         """Manual sync trigger"""
@@ -190,6 +254,8 @@ class AttendanceDevice(models.Model):
             created = 0
             updated = 0
 
+            # Resolve badges first so employees are matched in one batch
+            entries = []
             for user_data in users: 
                 device_user_id = str(user_data.get('device_user_id', ''))
                 if not device_user_id:
@@ -197,46 +263,61 @@ class AttendanceDevice(models.Model):
 
                 # Try to extract badge from name
                 device_user_name = user_data.get('name', '')
-                extracted = None
-                if device_user_name:
-                    numbers = re.findall(r'\d{6,}', device_user_name)
-                    if numbers:
-                        extracted = numbers[0]
+                match = _BADGE_RE.search(device_user_name) if device_user_name else None
+                extracted = match.group(0) if match else None
 
-                final_id = extracted or device_user_id
+                entries.append((extracted or device_user_id, device_user_name, user_data))
 
-                existing = self.env['attendance.device.user'].search([
-                    ('device_id', '=', self.id),
-                    ('device_user_id', '=', final_id)
-                ], limit=1)
+            DeviceUser = self.env['attendance.device.user']
+            matches = DeviceUser._find_employees_by_badges(
+                {final_id for final_id, _name, _data in entries}, self.company_id.id or None
+            )
 
-                # Try auto-match
-                employee = self._find_employee_by_badge(final_id)
+            existing_map = {
+                du.device_user_id: du
+                for du in DeviceUser.with_context(active_test=False).search([('device_id', '=', self.id)])
+            }
 
-                vals = {
-                    'device_id': self.id,
-                    'device_user_id': final_id,
-                    'device_user_name': device_user_name,
-                    'card_number': user_data.get('card_number') or '',
-                }
+            to_create = {}
+            to_update = {}  # employee id -> mappings to assign it to
+            for final_id, device_user_name, user_data in entries:
+                existing = existing_map.get(final_id)
 
-                if employee:
-                    vals.update({
-                        'employee_id': employee.id,
-                        'mapping_confidence': 'high',
-                        'mapping_method': 'Auto-matched during fetch'
-                    })
+                # Try auto-match
+                employee = matches.get(final_id, (None, None))[0]
 
                 if not existing:
-                    self.env['attendance.device.user'].create(vals)
-                    created += 1
+                    if final_id in to_create:
+                        continue
+
+                    vals = {
+                        'device_id': self.id,
+                        'device_user_id': final_id,
+                        'device_user_name': device_user_name,
+                        'card_number': user_data.get('card_number') or '',
+                    }
+
+                    if employee:
+                        vals.update({
+                            'employee_id': employee.id,
+                            'mapping_confidence': 'high',
+                            'mapping_method': 'Auto-matched during fetch'
+                        })
+                    to_create[final_id] = vals
                 elif employee and not existing.employee_id:
-                    existing.write({
-                        'employee_id': employee.id,
-                        'mapping_confidence': 'high',
-                        'mapping_method': 'Auto-matched during fetch'
-                    })
-                    updated += 1
+                    to_update[employee.id] = to_update.get(employee.id, DeviceUser) | existing
+
+            if to_create:
+                DeviceUser.create(list(to_create.values()))
+                created = len(to_create)
+
+            for employee_id, mappings in to_update.items():
+                mappings.write({
+                    'employee_id': employee_id,
+                    'mapping_confidence': 'high',
+                    'mapping_method': 'Auto-matched during fetch'
+                })
+                updated += len(mappings)
 
             return {
                 'type': 'ir.actions.client',
@@ -252,15 +333,7 @@ class AttendanceDevice(models.Model):
 
     def _find_employee_by_badge(self, badge_id):
         """Find employee by badge ID"""
-        Employee = self.env['hr.employee']
-        company_domain = [('company_id', 'in', [self.company_id.id, False])] if self.company_id else []
-
-        for field in ['identification_id', 'barcode', 'pin']:
-            if field in Employee._fields:
-                emp = Employee.search([(field, '=', badge_id)] + company_domain, limit=1)
-                if emp: 
-                    return emp
-        return None
+        return self.env['attendance.device.user']._find_employee_by_badge(badge_id, self.company_id.id or None)[0]
 
     def action_activate(self):
         self.write({'state': 'active'})
@@ -295,15 +368,49 @@ class AttendanceDevice(models.Model):
         devices = self.search([
             ('state', '=', 'active'),
             ('auto_sync', '=', True),
-            ('sync_mode', 'in', ['pull', 'both'])
+            ('sync_mode', 'in', ['pull', 'both']),
+            ('device_type', '!=', 'webhook')
         ])
-
-        for device in devices: 
-            try:
-                device._sync_attendance_logs()
-            except Exception as e:
-                _logger.error(f"Sync failed for {device.name}: {e}")
-                device.message_post(body=_("Sync failed: %s") % str(e))
+        devices -= devices._get_recently_pushed()
+        devices -= devices._get_recently_synced()
+
+        max_workers = int(self.env['ir.config_parameter'].sudo().get_param(
+            'attendance_gateway.sync_workers', MAX_SYNC_WORKERS
+        ))
+        sync_devices(devices, max_workers=max(1, max_workers))
+
+    def _get_recently_synced(self):
+        """
+        Devices pulled less than half a sync interval ago (at least 30 seconds).
+        Coalesces cron runs that fire faster than the device's own interval.
+        """
+        now = fields.Datetime.now()
+        return self.filtered(
+            lambda d: d.last_sync_date
+            and (now - d.last_sync_date).total_seconds() < max(30, d.sync_interval * 30)
+        )
+
+    def _get_recently_pushed(self):
+        """
+        Bidirectional devices that pushed punches within their sync interval.
+        Polling them again would only re-read what the webhook delivered.
+        """
+        push_devices = self.filtered(lambda d: d.sync_mode == 'both' and d.sync_interval > 0)
+        if not push_devices:
+            return self.browse()
+
+        now = fields.Datetime.now()
+        since = now - timedelta(minutes=max(push_devices.mapped('sync_interval')))
+        last_received = dict(self.env['attendance.raw.log']._read_group(
+            [('device_id', 'in', push_devices.ids), ('create_date', '>=', since)],
+            ['device_id'], ['create_date:max']
+        ))
+        # Logs stored after the last pull finished were pushed, not pulled
+        return push_devices.filtered(
+            lambda d: d in last_received
+            and last_received[d] >= now - timedelta(minutes=d.sync_interval)
+            and (not d.last_sync_date or last_received[d] > d.last_sync_date)
+        )
 
     def _sync_attendance_logs(self):
         """Core sync logic"""
@@ -318,10 +425,13 @@ class AttendanceDevice(models.Model):
         try:
             adapter = self._get_adapter()
             from_date = self.last_sync_date or (fields.Datetime.now() - timedelta(days=7))
-            raw_logs = adapter.get_attendance_logs(from_date=from_date)
 
+            # Process page by page to bound the size of each processing batch
             processor = self.env['attendance.processor']
-            result = processor.process_raw_logs(self, raw_logs)
+            result = processor._new_result([])
+            for raw_logs in adapter.get_attendance_log_pages(from_date=from_date):
+                for key, value in processor.process_raw_logs(self, raw_logs).items():
+                    result[key] += value
 
             sync_log.write({
                 'state': 'success' if result['failed'] == 0 else 'partial',
@@ -333,7 +443,8 @@ class AttendanceDevice(models.Model):
 
             self.write({
                 'last_sync_date': fields.Datetime.now(),
-                'state': 'active'
+                'state': 'active',
+                'is_online': True,
             })
 
             _logger.info(f"Sync completed for {self.name}: {result}")
@@ -346,5 +457,5 @@ class AttendanceDevice(models.Model):
                 'error_message': str(e),
                 'end_date': fields.Datetime.now()
             })
-            self.write({'state': 'error'})
+            self.write({'state': 'error', 'is_online': False})
             raise
\ No newline at end of file
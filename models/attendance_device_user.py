@@ -1,10 +1,27 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
+from odoo.osv import expression
 import re
 import logging
 
 _logger = logging.getLogger(__name__)
 
+# Employee fields tried for badge matching, in priority order
+_BADGE_FIELDS = ('identification_id', 'barcode', 'pin')
+_BADGE_MATCH_METHODS = {
+    'identification_id': 'Badge ID match (identification_id)',
+    'barcode': 'Barcode match',
+    'pin': 'PIN match',
+}
+# Badge fields that may match a number extracted from the user name
+_NAME_BADGE_LABELS = {'identification_id': 'Badge', 'barcode': 'Barcode'}
+
+# Name matching patterns
+_BADGE_NUM_RE = re.compile(r'\d{6,}')  # numbers with 6+ digits
+_PREFIX_RE = re.compile(r'^[A-Z]{2,3}-')  # prefixes like "NN-"
+_NONWORD_RE = re.compile(r'[^\w\s]')
+_STANDALONE_NUM_RE = re.compile(r'\b\d+\b')
+
 
 class AttendanceDeviceUser(models.Model):
     _name = 'attendance.device.user'
@@ -12,7 +29,7 @@ class AttendanceDeviceUser(models.Model):
     _rec_name = 'device_user_id'
 
     device_id = fields.Many2one('attendance.device', string='Device', required=True, ondelete='cascade')
-    employee_id = fields.Many2one('hr.employee', string='Employee', ondelete='cascade')
+    employee_id = fields.Many2one('hr.employee', string='Employee', ondelete='cascade', index=True)
     device_user_id = fields.Char(string='Device User ID', required=True, help='ID from device or Badge ID')
     device_user_name = fields.Char(string='Device User Name')
 
@@ -43,21 +60,12 @@ class AttendanceDeviceUser(models.Model):
     _sql_constraints = [
         ('device_user_unique', 'UNIQUE(device_id, device_user_id)',
          'Device user ID must be unique per device!'),
+        # Partial uniqueness: unmapped and archived mappings are not checked
+        ('employee_device_unique',
+         'EXCLUDE USING btree (device_id WITH =, employee_id WITH =) WHERE (employee_id IS NOT NULL AND active)',
+         'This employee is already mapped to another device user on this device!'),
     ]
 
-    @api.constrains('device_id', 'employee_id')
-    def _check_employee_device_unique(self):
-        for record in self:
-            if record.employee_id: 
-                duplicate = self.search([
-                    ('device_id', '=', record.device_id.id),
-                    ('employee_id', '=', record.employee_id.id),
-                    ('id', '!=', record.id)
-                ])
-                if duplicate:
-                    raise UserError(_("Employee %s is already mapped to device user %s on this device") %
-                                    (record.employee_id.name, duplicate.device_user_id))
-
     def name_get(self):
         result = []
         for record in self:
@@ -77,36 +85,36 @@ class AttendanceDeviceUser(models.Model):
         :param company_id: Optional company ID to filter by
         : return: tuple (employee record or None, match_method string or None)
         """
+        return self._find_employees_by_badges([badge_id], company_id).get(badge_id, (None, None))
+
+    @api.model
+    def _find_employees_by_badges(self, badges, company_id=None):
+        """
+        Find employees for many badge values with one search over all badge fields.
+        Fields are tried in priority order; within a field the first employee
+        in search order wins.
+
+        :param badges: iterable of badge strings to resolve
+        :param company_id: Optional company ID to filter by
+        :return: dict {badge: (employee, field name)} for matched badges only
+        """
         Employee = self.env['hr.employee']
-        employee_fields = Employee._fields
-        
+        fields_to_try = [f for f in _BADGE_FIELDS if f in Employee._fields]
+        badges = {badge for badge in badges if badge}
+        if not badges or not fields_to_try:
+            return {}
+
         company_domain = [('company_id', 'in', [company_id, False])] if company_id else []
-        
-        # Strategy 1: identification_id (Standard Odoo field - Employee ID/Badge)
-        if 'identification_id' in employee_fields:
-            employee = Employee.search([
-                ('identification_id', '=', badge_id)
-            ] + company_domain, limit=1)
-            if employee:
-                return employee, 'identification_id'
-        
-        # Strategy 2: barcode (May exist if hr_attendance is installed)
-        if 'barcode' in employee_fields:
-            employee = Employee.search([
-                ('barcode', '=', badge_id)
-            ] + company_domain, limit=1)
-            if employee:
-                return employee, 'barcode'
-        
-        # Strategy 3: pin (Attendance PIN - if exists)
-        if 'pin' in employee_fields:
-            employee = Employee.search([
-                ('pin', '=', badge_id)
-            ] + company_domain, limit=1)
-            if employee:
-                return employee, 'pin'
-        
-        return None, None
+        domain = expression.OR([[(f, 'in', list(badges))] for f in fields_to_try])
+        employees = Employee.search_fetch(expression.AND([domain, company_domain]), fields_to_try)
+
+        found = {}
+        for field_name in fields_to_try:
+            for employee in employees:
+                badge = employee[field_name]
+                if badge in badges and badge not in found:
+                    found[badge] = (employee, field_name)
+        return found
 
     @api.model
     def get_or_create_mapping(self, device, device_user_id):
@@ -143,26 +151,26 @@ class AttendanceDeviceUser(models.Model):
 
     def action_sync_to_device(self):
         """Push employee data to device"""
-        for record in self:
-            if not record.employee_id:
-                raise UserError(_("Please map an employee first"))
+        if self.filtered(lambda r: not r.employee_id):
+            raise UserError(_("Please map an employee first"))
 
-            try:
-                adapter = record.device_id._get_adapter()
-                adapter.push_user(record)
-                record.last_sync_date = fields.Datetime.now()
+        try:
+            # One adapter (and device session) per device for all its users
+            for device, records in self.grouped('device_id').items():
+                device._get_adapter().push_users(records)
+                records.write({'last_sync_date': fields.Datetime.now()})
+        except Exception as e:
+            raise UserError(_("Failed to sync user: %s") % str(e))
 
-                return {
-                    'type': 'ir.actions.client',
-                    'tag': 'display_notification',
-                    'params': {
-                        'title': _('Success'),
-                        'message': _('User synced to device successfully'),
-                        'type': 'success',
-                    }
-                }
-            except Exception as e:
-                raise UserError(_("Failed to sync user: %s") % str(e))
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Success'),
+                'message': _('%d user(s) synced to device successfully') % len(self),
+                'type': 'success',
+            }
+        }
 
     def action_auto_map_employees(self):
         """Enhanced auto-mapping with Badge ID priority"""
@@ -171,28 +179,44 @@ class AttendanceDeviceUser(models.Model):
         medium_confidence = 0
         low_confidence = 0
 
-        for record in self.filtered(lambda r: not r.employee_id):
-            result = self._find_best_employee_match(
-                record.device_id,
-                record.device_user_id,
-                record.device_user_name,
-                record.card_number
-            )
-
-            if result['employee']: 
-                record.write({
-                    'employee_id': result['employee'].id,
-                    'mapping_confidence': result['confidence'],
-                    'mapping_method': result['method']
-                })
-                mapped_count += 1
-
-                if result['confidence'] == 'high':
-                    high_confidence += 1
-                elif result['confidence'] == 'medium': 
-                    medium_confidence += 1
-                else: 
-                    low_confidence += 1
+        unmapped = self.filtered(lambda r: not r.employee_id)
+        card_cache = self._build_card_cache(unmapped.mapped('card_number'))
+
+        for company, records in unmapped.grouped('company_id').items():
+            # Resolve every badge of the batch up front instead of searching per record
+            badges = set(records.mapped('device_user_id'))
+            for name in records.mapped('device_user_name'):
+                if name:
+                    badges.update(_BADGE_NUM_RE.findall(name))
+            badge_matches = self._find_employees_by_badges(badges, company.id or None)
+
+            for record in records:
+                result = self._find_best_employee_match(
+                    record.device_id,
+                    record.device_user_id,
+                    record.device_user_name,
+                    record.card_number,
+                    badge_matches=badge_matches,
+                    card_cache=card_cache,
+                )
+
+                if result['employee']: 
+                    record.write({
+                        'employee_id': result['employee'].id,
+                        'mapping_confidence': result['confidence'],
+                        'mapping_method': result['method']
+                    })
+                    mapped_count += 1
+                    # Later users with the same card can match this new mapping
+                    if record.card_number:
+                        card_cache.setdefault(record.card_number, result['employee'].id)
+
+                    if result['confidence'] == 'high':
+                        high_confidence += 1
+                    elif result['confidence'] == 'medium': 
+                        medium_confidence += 1
+                    else: 
+                        low_confidence += 1
 
         message = _('Mapped %d users to employees:\n- High confidence: %d\n- Medium confidence: %d\n- Low confidence: %d') % (
             mapped_count, high_confidence, medium_confidence, low_confidence
@@ -212,90 +236,64 @@ class AttendanceDeviceUser(models.Model):
             }
         }
 
-    def _find_best_employee_match(self, device, device_user_id, device_user_name, card_number):
+    def _build_card_cache(self, card_numbers):
+        """
+        Map card numbers to the employee of an existing mapping using that card.
+
+        :param card_numbers: iterable of card numbers to resolve
+        :return: dict {card number: employee id}, oldest mapping wins
+        """
+        cards = [card for card in set(card_numbers) if card and card != '0']
+        if not cards:
+            return {}
+
+        card_cache = {}
+        for row in self.search_read([
+            ('card_number', 'in', cards),
+            ('employee_id', '!=', False)
+        ], ['card_number', 'employee_id'], order='id'):
+            card_cache.setdefault(row['card_number'], row['employee_id'][0])
+        return card_cache
+
+    def _find_best_employee_match(self, device, device_user_id, device_user_name, card_number,
+                                  badge_matches=None, card_cache=None):
         """Find best employee match using multiple strategies with safe field checking"""
 
         Employee = self.env['hr.employee']
-        employee_fields = Employee._fields
         company_id = device.company_id.id if device.company_id else None
         company_domain = [('company_id', 'in', [company_id, False])] if company_id else []
 
-        # PRIORITY 1: Match by identification_id (Badge ID - MOST IMPORTANT!)
-        if 'identification_id' in employee_fields:
-            employee = Employee.search([
-                ('identification_id', '=', device_user_id)
-            ] + company_domain, limit=1)
-
-            if employee:
-                return {
-                    'employee': employee,
-                    'confidence': 'high',
-                    'method': 'Badge ID match (identification_id)'
-                }
-
-        # PRIORITY 2: Match by barcode (if field exists)
-        if 'barcode' in employee_fields: 
-            employee = Employee.search([
-                ('barcode', '=', device_user_id)
-            ] + company_domain, limit=1)
+        numbers = _BADGE_NUM_RE.findall(device_user_name) if device_user_name else []
+        if badge_matches is None:
+            badge_matches = self._find_employees_by_badges([device_user_id] + numbers, company_id)
+        if card_cache is None:
+            card_cache = self._build_card_cache([card_number])
 
-            if employee: 
-                return {
-                    'employee': employee,
-                    'confidence': 'high',
-                    'method': 'Barcode match'
-                }
-
-        # PRIORITY 3: Match by pin (if field exists)
-        if 'pin' in employee_fields: 
-            employee = Employee.search([
-                ('pin', '=', device_user_id)
-            ] + company_domain, limit=1)
+        # PRIORITY 1-3: Match by identification_id (Badge ID - MOST IMPORTANT!), barcode, pin
+        employee, field_name = badge_matches.get(device_user_id, (None, None))
+        if employee:
+            return {
+                'employee': employee,
+                'confidence': 'high',
+                'method': _BADGE_MATCH_METHODS[field_name]
+            }
 
-            if employee:
+        # PRIORITY 4: Extract badge from device_user_name (e.g., "NN-60910013")
+        for num in numbers:
+            employee, field_name = badge_matches.get(num, (None, None))
+            if field_name in _NAME_BADGE_LABELS:
                 return {
                     'employee': employee,
                     'confidence': 'high',
-                    'method': 'PIN match'
+                    'method': f'{_NAME_BADGE_LABELS[field_name]} extracted from name ({num})'
                 }
 
-        # PRIORITY 4: Extract badge from device_user_name (e.g., "NN-60910013")
-        if device_user_name:
-            numbers = re.findall(r'\d{6,}', device_user_name)  # Find numbers with 6+ digits
-            for num in numbers:
-                # Try identification_id
-                if 'identification_id' in employee_fields:
-                    employee = Employee.search([
-                        ('identification_id', '=', num)
-                    ] + company_domain, limit=1)
-                    if employee:
-                        return {
-                            'employee': employee,
-                            'confidence': 'high',
-                            'method': f'Badge extracted from name ({num})'
-                        }
-
-                # Try barcode
-                if 'barcode' in employee_fields:
-                    employee = Employee.search([
-                        ('barcode', '=', num)
-                    ] + company_domain, limit=1)
-                    if employee:
-                        return {
-                            'employee': employee,
-                            'confidence': 'high',
-                            'method': f'Barcode extracted from name ({num})'
-                        }
-
         # PRIORITY 5: Match by card number (if we have other mappings with same card)
         if card_number and card_number != '0': 
-            existing = self.search([
-                ('card_number', '=', card_number),
-                ('employee_id', '!=', False)
-            ], limit=1)
-            if existing:
+            employee_id = card_cache.get(card_number)
+            if employee_id:
                 return {
-                    'employee': existing.employee_id,
+                    'employee': Employee.browse(employee_id),
                     'confidence': 'medium',
                     'method': 'Card number match'
                 }
@@ -303,14 +301,14 @@ class AttendanceDeviceUser(models.Model):
         # PRIORITY 6: Match by name (if device_user_name exists)
         if device_user_name:
             # Clean the name (remove prefixes like "NN-")
-            clean_name = re.sub(r'^[A-Z]{2,3}-', '', device_user_name)
+            clean_name = _PREFIX_RE.sub('', device_user_name)
             clean_name = self._clean_name(clean_name)
 
             if clean_name:
                 # Exact name match
-                employee = Employee.search([
+                employee = Employee.search_fetch([
                     ('name', '=ilike', clean_name)
-                ] + company_domain, limit=1)
+                ] + company_domain, ['id'], limit=1)
                 if employee: 
                     return {
                         'employee': employee,
@@ -328,7 +326,8 @@ class AttendanceDeviceUser(models.Model):
                             domain.append(('name', 'ilike', part))
                     
                     if len(domain) > len(company_domain):
-                        employees = Employee.search(domain)
+                        # Two rows are enough to tell a unique match from an ambiguous one
+                        employees = Employee.search_fetch(domain, ['id'], limit=2)
                         if len(employees) == 1:
                             return {
                                 'employee': employees,
@@ -351,7 +350,7 @@ class AttendanceDeviceUser(models.Model):
         # Remove extra whitespace
         name = ' '.join(name.split())
         # Remove special characters but keep letters and spaces
-        name = re.sub(r'[^\w\s]', '', name)
+        name = _NONWORD_RE.sub('', name)
         # Remove standalone numbers
-        name = re.sub(r'\b\d+\b', '', name)
+        name = _STANDALONE_NUM_RE.sub('', name)
         return name.strip()
\ No newline at end of file
@@ -1,11 +1,21 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError
-from datetime import datetime
-import pytz
+from datetime import datetime, timezone as dt_timezone
+from zoneinfo import ZoneInfo
 import logging
 
 _logger = logging.getLogger(__name__)
 
+_PUNCH_TYPES = [
+    ('0', 'Check In'),
+    ('1', 'Check Out'),
+    ('2', 'Break Out'),
+    ('3', 'Break In'),
+    ('4', 'Overtime Start'),
+    ('5', 'Overtime End'),
+]
+_PUNCH_LABELS = dict(_PUNCH_TYPES)
+
 
 class AttendancePunchSlot(models.Model):
     _name = 'attendance.punch.slot'
@@ -21,14 +31,7 @@ class AttendancePunchSlot(models.Model):
     name = fields.Char(string='Name', required=True)
     sequence = fields.Integer(string='Sequence', default=10)
 
-    punch_type = fields.Selection([
-        ('0', 'Check In'),
-        ('1', 'Check Out'),
-        ('2', 'Break Out'),
-        ('3', 'Break In'),
-        ('4', 'Overtime Start'),
-        ('5', 'Overtime End'),
-    ], string='Punch Type', required=True)
+    punch_type = fields.Selection(_PUNCH_TYPES, string='Punch Type', required=True)
 
     time_from = fields.Float(
         string='Window Start',
@@ -58,23 +61,40 @@ class AttendancePunchSlot(models.Model):
         compute='_compute_punch_type_display'
     )
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        slots = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return slots
+
+    def write(self, vals):
+        res = super().write(vals)
+        # Fields that decide which slots a shift matches, and in which order
+        if {'shift_id', 'sequence', 'time_from', 'active'} & set(vals):
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
     @api.depends('time_from', 'time_to')
     def _compute_time_display(self):
+        float_to_time = self._float_to_time
         for record in self:
-            record.time_display = f"{self._float_to_time(record.time_from)} - {self._float_to_time(record.time_to)}"
+            record.time_display = f"{float_to_time(record.time_from)} - {float_to_time(record.time_to)}"
 
     @api.depends('punch_type')
     def _compute_punch_type_display(self):
-        type_labels = dict(self._fields['punch_type'].selection)
         for record in self:
-            record.punch_type_display = type_labels.get(record.punch_type, '')
+            record.punch_type_display = _PUNCH_LABELS.get(record.punch_type, '')
 
     @staticmethod
     def _float_to_time(float_time):
         """Convert float to HH:MM string"""
-        hours = int(float_time) % 24
-        minutes = int((float_time % 1) * 60)
-        return f"{hours:02d}:{minutes:02d}"
+        hours, minutes = divmod(round(float_time * 60), 60)
+        return f"{hours % 24:02d}:{minutes:02d}"
 
     @api.constrains('time_from', 'time_to')
     def _check_times(self):
@@ -96,19 +116,43 @@ class AttendancePunchSlot(models.Model):
             bool: True if time is within window
         """
         self.ensure_one()
+        return self._window_contains(self._local_hour(check_time, timezone))
+
+    def find_matching_slot(self, check_time, timezone='UTC'):
+        """
+        Return the first slot of this recordset, in its current order, whose
+        window contains the given datetime. The time is converted once for all slots.
+
+        Args:
+            check_time: datetime object (UTC)
+            timezone: timezone string for the device/shift
 
-        # Convert to local time
-        tz = pytz.timezone(timezone)
+        Returns:
+            attendance.punch.slot record, empty if no slot matches
+        """
+        current_hour = self._local_hour(check_time, timezone)
+        for slot in self:
+            if slot._window_contains(current_hour):
+                return slot
+        return self.browse()
+
+    @api.model
+    def _local_hour(self, check_time, timezone='UTC'):
+        """Local hour of day of a UTC datetime, as a float (e.g. 7.5 = 07:30)"""
         if check_time.tzinfo is None:
-            check_time = pytz.UTC.localize(check_time)
+            check_time = check_time.replace(tzinfo=dt_timezone.utc)
+
+        local_time = check_time.astimezone(ZoneInfo(timezone))
+        return local_time.hour + local_time.minute / 60.0 + local_time.second / 3600.0
 
-        local_time = check_time.astimezone(tz)
-        current_hour = local_time.hour + local_time.minute / 60.0 + local_time.second / 3600.0
+    def _window_contains(self, current_hour):
+        """Check a local float hour against this slot's window"""
+        time_from, time_to = self.time_from, self.time_to
 
         # Handle cross-midnight windows (e.g., 22:00 to 06:00)
-        if self.time_to <= self.time_from:
+        if time_to <= time_from:
             # Window crosses midnight
-            return current_hour >= self.time_from or current_hour <= self.time_to
+            return current_hour >= time_from or current_hour <= time_to
         else:
             # Normal window
-            return self.time_from <= current_hour <= self.time_to
\ No newline at end of file
+            return time_from <= current_hour <= time_to
\ No newline at end of file
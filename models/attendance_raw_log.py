@@ -1,10 +1,22 @@
 from odoo import models, fields, api, _
-from odoo.exceptions import UserError
-from datetime import timedelta
+from odoo.exceptions import UserError, ValidationError
+from datetime import timedelta, timezone
+from psycopg2.extras import execute_values
+import hashlib
 import logging
 
 _logger = logging.getLogger(__name__)
 
+_PUNCH_TYPES = [
+    ('0', 'Check In'),
+    ('1', 'Check Out'),
+    ('2', 'Break Out'),
+    ('3', 'Break In'),
+    ('4', 'Overtime Start'),
+    ('5', 'Overtime End'),
+]
+_PUNCH_LABELS = dict(_PUNCH_TYPES)
+
 
 class AttendanceRawLog(models.Model):
     _name = 'attendance.raw.log'
@@ -26,28 +38,21 @@ class AttendanceRawLog(models.Model):
         required=True,
         index=True
     )
+    # Indexed through (device_id, timestamp DESC) in init()
     timestamp = fields.Datetime(
         string='Punch Time',
-        required=True,
-        index=True
+        required=True
     )
 
     # Punch type determined by our system
-    punch_type = fields.Selection([
-        ('0', 'Check In'),
-        ('1', 'Check Out'),
-        ('2', 'Break Out'),
-        ('3', 'Break In'),
-        ('4', 'Overtime Start'),
-        ('5', 'Overtime End'),
-    ], string='Punch Type', default='0', help='Punch type determined by system')
+    punch_type = fields.Selection(_PUNCH_TYPES, string='Punch Type', default='0', help='Punch type determined by system')
 
     state = fields.Selection([
         ('pending', 'Pending'),
         ('processed', 'Processed'),
         ('ignored', 'Ignored'),
         ('error', 'Error'),
-    ], string='Status', default='pending', index=True)
+    ], string='Status', default='pending')
 
     employee_id = fields.Many2one(
         'hr.employee',
@@ -58,10 +63,18 @@ class AttendanceRawLog(models.Model):
     attendance_id = fields.Many2one(
         'hr.attendance',
         string='Attendance',
-        readonly=True
+        readonly=True,
+        index='btree_not_null'
     )
     message = fields.Char(string='Message')
-    raw_data = fields.Text(string='Raw Data')
+    # Only shown on the form; kept out of the batched prefetch of other fields
+    raw_data = fields.Text(string='Raw Data', prefetch=False)
+    event_hash = fields.Char(
+        string='Event Key',
+        readonly=True,
+        copy=False,
+        help='Stable hash of device, user, timestamp and device punch type used to drop re-pushed punches'
+    )
 
     company_id = fields.Many2one(
         'res.company',
@@ -72,46 +85,115 @@ class AttendanceRawLog(models.Model):
     _sql_constraints = [
         ('unique_log', 'UNIQUE(device_id, device_user_id, timestamp)',
          'Duplicate punch detected!'),
+        ('event_hash_unique', 'UNIQUE(event_hash)',
+         'Duplicate punch detected!'),
     ]
 
+    def init(self):
+        # Superseded by the device/timestamp index and the partial state
+        # indexes below; one less index to maintain on every insert
+        self.env.cr.execute("DROP INDEX IF EXISTS attendance_raw_log_dev_state_ts_idx")
+        # A device's punch logs, newest first (device form's Punch Logs list)
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS attendance_raw_log_dev_ts_idx
+                ON attendance_raw_log (device_id, timestamp DESC)
+        """)
+        # The queue drained by cron_process_pending_logs; rows leave it once
+        # processed, so this partial index stays small as the table grows.
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS attendance_raw_log_pending_ts_idx
+                ON attendance_raw_log (timestamp, id)
+                WHERE state = 'pending'
+        """)
+        # Logs that can still be reprocessed; replaces a plain state index
+        # that was mostly made of processed rows
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS attendance_raw_log_unprocessed_idx
+                ON attendance_raw_log (device_id, timestamp)
+                WHERE state IN ('pending', 'error', 'ignored')
+        """)
+
+    @api.model
+    def _make_event_hash(self, device_id, device_user_id, timestamp, punch_type):
+        """Stable 16-byte key identifying a device punch event"""
+        epoch = int(timestamp.replace(tzinfo=timezone.utc).timestamp())
+        key = f"{device_id}|{device_user_id}|{epoch}|{punch_type}"
+        return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+    @api.model
+    def _insert_ignore_duplicates(self, device, vals_list):
+        """
+        Insert pending raw logs in one statement, silently skipping rows that
+        collide with an existing punch (ON CONFLICT DO NOTHING).
+
+        :param device: attendance.device record the logs belong to
+        :param vals_list: list of dicts with device_user_id, timestamp, punch_type, raw_data
+        :return: recordset of the rows actually inserted, in timestamp order
+        """
+        if not vals_list:
+            return self.browse()
+
+        # The raw INSERT skips the ORM's selection check
+        unknown = {vals['punch_type'] for vals in vals_list} - dict(self._fields['punch_type'].selection).keys()
+        if unknown:
+            raise ValidationError(_("Unknown punch type(s): %s") % ', '.join(sorted(unknown)))
+
+        self.flush_model()
+        now = fields.Datetime.now()
+        uid = self.env.uid
+        company_id = device.company_id.id or None
+        rows = [(
+            device.id,
+            vals['device_user_id'],
+            vals['timestamp'],
+            vals['punch_type'],
+            vals['raw_data'],
+            'pending',
+            company_id,
+            self._make_event_hash(device.id, vals['device_user_id'], vals['timestamp'], vals['punch_type']),
+            uid, now, uid, now,
+        ) for vals in vals_list]
+
+        inserted = execute_values(self.env.cr, """
+            INSERT INTO attendance_raw_log (
+                device_id, device_user_id, timestamp, punch_type, raw_data, state,
+                company_id, event_hash, create_uid, create_date, write_uid, write_date
+            ) VALUES %s
+            ON CONFLICT DO NOTHING
+            RETURNING id, timestamp
+        """, rows, page_size=1000, fetch=True)
+
+        # Order from the returned rows so no record is loaded into the ORM cache
+        inserted.sort(key=lambda row: (row[1], row[0]))
+        return self.browse([row[0] for row in inserted])
+
     @api.depends('employee_id', 'punch_type', 'timestamp')
     def _compute_display_name(self):
-        punch_labels = dict(self._fields['punch_type'].selection)
+        # Load only the employee names, in one query, instead of every hr.employee field
+        self.employee_id.fetch(['name'])
         for record in self:
             emp_name = record.employee_id.name if record.employee_id else record.device_user_id
-            punch_label = punch_labels.get(record.punch_type, 'Unknown')
+            punch_label = _PUNCH_LABELS.get(record.punch_type, 'Unknown')
             time_str = record.timestamp.strftime('%Y-%m-%d %H:%M') if record.timestamp else ''
             record.display_name = f"{emp_name} - {punch_label} @ {time_str}"
 
     def action_reprocess(self):
         """Reprocess selected logs"""
-        processor = self.env['attendance.processor']
-        success = 0
-        failed = 0
-
-        for log in self.filtered(lambda l: l.state in ['pending', 'error', 'ignored']):
-            try:
-                # Reset state
-                log.write({
-                    'state': 'pending',
-                    'message': False,
-                    'attendance_id': False
-                })
-                
-                # Reprocess
-                result = processor.process_single_log(log)
-                
-                if result.get('success'):
-                    success += 1
-                elif result.get('ignored'):
-                    success += 1  # Ignored is still "processed"
-                else:
-                    failed += 1
-                    
-            except Exception as e:
-                failed += 1
-                log.write({'state': 'error', 'message': str(e)[:200]})
-                _logger.error(f"Reprocess failed for log {log.id}: {e}")
+        logs = self.filtered(lambda l: l.state in ['pending', 'error', 'ignored'])
+        if not logs:
+            return {'type': 'ir.actions.act_window_close'}
+
+        # Reset state in one write, then reprocess the whole batch
+        logs.write({
+            'state': 'pending',
+            'message': False,
+            'attendance_id': False
+        })
+        results = self.env['attendance.processor'].process_logs(logs)
+
+        # Ignored is still "processed"; failures were already flagged on the log
+        success = sum(1 for result in results.values() if result.get('success') or result.get('ignored'))
+        failed = len(results) - success
 
         return {
             'type': 'ir.actions.client',
@@ -124,23 +206,21 @@ class AttendanceRawLog(models.Model):
         }
 
     def action_force_checkin(self):
-        """Force this punch to be treated as a check-in by closing any open attendance first"""
-        self.ensure_one()
-        
-        if self.state == 'processed': 
+        """Force these punches to be treated as check-ins by closing any open attendance first"""
+        if any(log.state == 'processed' for log in self):
             raise UserError(_("Cannot modify an already processed log. Please delete the related attendance first."))
 
-        if not self.employee_id:
+        processor = self.env['attendance.processor']
+        for log in self.filtered(lambda l: not l.employee_id):
             # Try to find employee
-            processor = self.env['attendance.processor']
-            employee = processor._find_employee_by_badge(self.device_id, self.device_user_id)
+            employee = processor._find_employee_by_badge(log.device_id, log.device_user_id)
             if not employee:
                 raise UserError(_("Cannot find employee for this device user. Please map the employee first."))
-            self.employee_id = employee.id
+            log.employee_id = employee.id
 
-        # Close any open attendance
+        # Close any open attendance of these employees in one search
         open_att = self.env['hr.attendance'].search([
-            ('employee_id', '=', self.employee_id.id),
+            ('employee_id', 'in', self.employee_id.ids),
             ('check_out', '=', False)
         ])
         
@@ -149,7 +229,6 @@ class AttendanceRawLog(models.Model):
                 'check_out': att.check_in + timedelta(minutes=1),
                 'note': f"{att.note or ''}\n⚠️ Manually closed to allow forced check-in".strip()
             })
-            att._compute_status()
 
         # Now reprocess
         self.write({'state': 'pending', 'message': 'Forcing as check-in'})
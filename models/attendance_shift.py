@@ -1,11 +1,55 @@
-from odoo import models, fields, api, _
+from odoo import models, fields, api, tools, _, Command
 from odoo.exceptions import ValidationError
-from datetime import datetime, timedelta, time
-import pytz
+from datetime import datetime, timedelta, time, timezone as dt_timezone
+from zoneinfo import ZoneInfo
+import collections
+import functools
 import logging
 
 _logger = logging.getLogger(__name__)
 
+ShiftBounds = collections.namedtuple(
+    'ShiftBounds', ['shift_start', 'shift_end', 'late_threshold', 'early_leave_threshold']
+)
+
+
+def _standard_time(local_dt):
+    """
+    Resolve a repeated wall time (DST fall-back) to its non-DST occurrence,
+    as pytz's localize(is_dst=False) did. Skipped wall times keep fold=0,
+    which already matches pytz.
+    """
+    later = local_dt.replace(fold=1)
+    if later.utcoffset() < local_dt.utcoffset() and not later.dst():
+        return later
+    return local_dt
+
+
+@functools.lru_cache(maxsize=1024)
+def _shift_bounds(check_date, timezone, hour_from, hour_to, is_night_shift, late_minutes, early_minutes):
+    """
+    Shift boundaries for one day. Keyed on the shift's values rather than its
+    id, so editing a shift never needs the cache cleared.
+    """
+    # Aware arithmetic on zoneinfo datetimes is wall-clock, so adding the
+    # shift hours to local midnight gives the right offset on DST days
+    midnight = datetime.combine(check_date, time.min, tzinfo=ZoneInfo(timezone))
+
+    # Build start and end once; thresholds are fixed offsets from them
+    shift_start = midnight + timedelta(minutes=round(hour_from * 60))
+    end_day = midnight + timedelta(days=1) if is_night_shift else midnight
+    shift_end = end_day + timedelta(minutes=round(hour_to * 60))
+
+    # Convert to UTC naive for database comparison
+    shift_start = _standard_time(shift_start).astimezone(dt_timezone.utc).replace(tzinfo=None)
+    shift_end = _standard_time(shift_end).astimezone(dt_timezone.utc).replace(tzinfo=None)
+    return ShiftBounds(
+        shift_start,
+        shift_end,
+        shift_start + timedelta(minutes=late_minutes),
+        shift_end - timedelta(minutes=early_minutes),
+    )
+
 
 class AttendanceShift(models.Model):
     _name = 'attendance.shift'
@@ -124,40 +168,63 @@ class AttendanceShift(models.Model):
          'Shift code must be unique per company!'),
     ]
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        shifts = super().create(vals_list)
+        if any(shifts.mapped('is_default')):
+            self.env.registry.clear_cache()
+        return shifts
+
+    def write(self, vals):
+        res = super().write(vals)
+        # Fields that decide which shift _get_default_shift_id returns
+        if {'is_default', 'company_id', 'active'} & set(vals):
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
     @api.depends('work_hour_from', 'work_hour_to')
     def _compute_shift_info(self):
         for record in self:
-            if record.work_hour_to < record.work_hour_from:
+            hour_from, hour_to = record.work_hour_from, record.work_hour_to
+            if hour_to < hour_from:
                 # Night shift (e.g., 22:00 to 06:00)
                 record.is_night_shift = True
-                record.expected_hours = (24 - record.work_hour_from) + record.work_hour_to
+                record.expected_hours = (24 - hour_from) + hour_to
             else:
                 record.is_night_shift = False
-                record.expected_hours = record.work_hour_to - record.work_hour_from
+                record.expected_hours = hour_to - hour_from
 
     @api.depends('work_hour_from', 'work_hour_to')
     def _compute_work_time_display(self):
+        float_to_time_str = self._float_to_time_str
         for record in self:
-            record.work_time_display = f"{self._float_to_time_str(record.work_hour_from)} - {self._float_to_time_str(record.work_hour_to)}"
+            record.work_time_display = f"{float_to_time_str(record.work_hour_from)} - {float_to_time_str(record.work_hour_to)}"
 
     @staticmethod
+    @functools.lru_cache(maxsize=512)
     def _float_to_time_str(float_time):
         """Convert float (e.g., 9.5) to time string (09:30)"""
-        hours = int(float_time)
-        minutes = int((float_time - hours) * 60)
-        return f"{hours: 02d}:{minutes:02d}"
+        hours, minutes = divmod(round(float_time * 60), 60)
+        return f"{hours:02d}:{minutes:02d}"
 
     @api.constrains('is_default')
     def _check_single_default(self):
-        for record in self:
-            if record.is_default:
-                others = self.search([
-                    ('is_default', '=', True),
-                    ('company_id', '=', record.company_id.id),
-                    ('id', '!=', record.id)
-                ])
-                if others:
-                    raise ValidationError(_('Only one default shift is allowed per company!'))
+        defaults = self.filtered('is_default')
+        if not defaults:
+            return
+
+        # One count of default shifts per company covers the whole batch
+        groups = self._read_group([
+            ('is_default', '=', True),
+            ('company_id', 'in', list({record.company_id.id for record in defaults})),
+        ], ['company_id'], ['__count'])
+        if any(count > 1 for _company, count in groups):
+            raise ValidationError(_('Only one default shift is allowed per company!'))
 
     @api.constrains('min_punch_gap_minutes')
     def _check_min_punch_gap(self):
@@ -176,7 +243,7 @@ class AttendanceShift(models.Model):
         Get shift start/end datetime for a specific date.
         Used for calculating late/early status.
         
-        Returns dict with:
+        Returns ShiftBounds with:
         - shift_start: Expected shift start datetime (UTC, naive)
         - shift_end: Expected shift end datetime (UTC, naive)
         - late_threshold: Time after which employee is considered late
@@ -187,28 +254,10 @@ class AttendanceShift(models.Model):
         if isinstance(check_date, datetime):
             check_date = check_date.date()
 
-        tz = pytz.timezone(timezone)
-
-        # Calculate shift start
-        start_hour = int(self.work_hour_from)
-        start_min = int((self.work_hour_from - start_hour) * 60)
-        shift_start = tz.localize(datetime.combine(check_date, time(start_hour, start_min)))
-
-        # Calculate shift end
-        end_hour = int(self.work_hour_to)
-        end_min = int((self.work_hour_to - end_hour) * 60)
-        if self.is_night_shift:
-            shift_end = tz.localize(datetime.combine(check_date + timedelta(days=1), time(end_hour, end_min)))
-        else:
-            shift_end = tz.localize(datetime.combine(check_date, time(end_hour, end_min)))
-
-        # Convert to UTC naive for database comparison
-        return {
-            'shift_start': shift_start.astimezone(pytz.UTC).replace(tzinfo=None),
-            'shift_end': shift_end.astimezone(pytz.UTC).replace(tzinfo=None),
-            'late_threshold': (shift_start + timedelta(minutes=self.late_after_minutes)).astimezone(pytz.UTC).replace(tzinfo=None),
-            'early_leave_threshold': (shift_end - timedelta(minutes=self.early_leave_before_minutes)).astimezone(pytz.UTC).replace(tzinfo=None),
-        }
+        return _shift_bounds(
+            check_date, timezone, self.work_hour_from, self.work_hour_to, self.is_night_shift,
+            self.late_after_minutes, self.early_leave_before_minutes,
+        )
 
     def get_punch_type_for_time(self, punch_time, timezone='UTC'):
         """
@@ -227,16 +276,24 @@ class AttendanceShift(models.Model):
         if not self.use_punch_slots:
             return None
         
-        if not self.punch_slot_ids:
-            return None
-        
         # Check each slot in sequence order
-        for slot in self.punch_slot_ids.filtered(lambda s: s.active).sorted('sequence'):
-            if slot.is_time_in_window(punch_time, timezone):
-                return slot.punch_type
-        
         # No matching slot - return None to use toggle logic
-        return None
+        return self._get_active_slots().find_matching_slot(punch_time, timezone).punch_type or None
+
+    def _get_active_slots(self):
+        """Active punch slots of this shift in matching (sequence) order"""
+        self.ensure_one()
+        return self.env['attendance.punch.slot'].browse(self._get_active_slot_ids(self.id))
+
+    @api.model
+    @tools.ormcache('shift_id')
+    def _get_active_slot_ids(self, shift_id):
+        """Ordered active slot ids of a shift, cached per worker until slots change"""
+        # Filter on active explicitly: the cache key must not depend on the
+        # caller's active_test context
+        return tuple(self.env['attendance.punch.slot'].sudo().with_context(active_test=False).search(
+            [('shift_id', '=', shift_id), ('active', '=', True)], order='sequence, time_from, id'
+        ).ids)
 
     @api.model
     def get_employee_shift(self, employee):
@@ -247,18 +304,27 @@ class AttendanceShift(models.Model):
 
         # Fall back to company default
         company_id = employee.company_id.id if employee.company_id else None
-        return self.search([
+        return self.browse(self._get_default_shift_id(company_id))
+
+    @api.model
+    @tools.ormcache('company_id')
+    def _get_default_shift_id(self, company_id):
+        """Default shift id for a company, cached per worker until shifts change"""
+        # At most one default per company plus one shared default, so skip
+        # the sequence/name sort and prefer the company-specific one. Filter on
+        # active explicitly: the cache key must not depend on active_test.
+        shifts = self.sudo().with_context(active_test=False).search([
             ('is_default', '=', True),
+            ('active', '=', True),
             ('company_id', 'in', [company_id, False])
-        ], limit=1)
+        ], order='id')
+        shift = shifts.filtered('company_id')[:1] or shifts[:1]
+        return shift.id or None
 
     def action_create_default_slots(self):
         """Create sensible default punch slots based on shift hours"""
         self.ensure_one()
-        
-        # Clear existing slots
-        self.punch_slot_ids.unlink()
-        
+
         # Calculate reasonable windows
         shift_start = self.work_hour_from
         shift_end = self.work_hour_to if not self.is_night_shift else self.work_hour_to + 24
@@ -321,13 +387,14 @@ class AttendanceShift(models.Model):
             ])
         
         for slot_data in slots_data:
-            slot_data['shift_id'] = self.id
             # Normalize times to 0-24 range
             slot_data['time_from'] = slot_data['time_from'] % 24
             slot_data['time_to'] = slot_data['time_to'] % 24 if slot_data['time_to'] < 24 else slot_data['time_to'] - 24
-            self.env['attendance.punch.slot'].create(slot_data)
-        
-        self.use_punch_slots = True
+        # Replace existing slots and enable them in a single write
+        self.write({
+            'use_punch_slots': True,
+            'punch_slot_ids': [Command.clear()] + [Command.create(vals) for vals in slots_data],
+        })
         
         return {
             'type': 'ir.actions.client',
@@ -14,17 +14,33 @@ class HrAttendance(models.Model):
     device_id = fields.Many2one(
         'attendance.device',
         string='Device',
-        readonly=True
+        readonly=True,
+        index='btree_not_null'
     )
     is_from_device = fields.Boolean(
         string='From Device',
         default=False,
         readonly=True
     )
+    is_auto_closed = fields.Boolean(
+        string='Auto Closed',
+        default=False,
+        readonly=True,
+        help='Checked out by the system because no checkout was punched'
+    )
     shift_id = fields.Many2one(
         'attendance.shift',
         string='Shift'
     )
+    # Stored so multi-company filtering reads a local column instead of
+    # joining hr_employee on every search
+    company_id = fields.Many2one(
+        'res.company',
+        string='Company',
+        related='employee_id.company_id',
+        store=True,
+        index=True
+    )
 
     # ===========================================
     # ATTENDANCE STATUS
@@ -67,7 +83,16 @@ class HrAttendance(models.Model):
     # ===========================================
     note = fields.Text(string='Notes')
 
-    @api.depends('check_in', 'check_out', 'shift_id', 'employee_id')
+    def init(self):
+        super().init()
+        # Per-employee lookups ordered by check-in (open attendance, stale
+        # auto-close, latest attendance) done for every processed punch
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS hr_attendance_emp_checkin_idx
+                ON hr_attendance (employee_id, check_in)
+        """)
+
+    @api.depends('check_in', 'check_out', 'shift_id', 'employee_id', 'is_auto_closed')
     def _compute_status(self):
         """
         Calculate attendance status based on shift rules.
@@ -82,6 +107,8 @@ class HrAttendance(models.Model):
         
         If not checked out: checked_in
         """
+        # Attendances of the same shift, day and timezone share boundaries
+        boundaries_cache = {}
         for record in self:
             # Reset computed values
             record.late_minutes = 0
@@ -99,7 +126,7 @@ class HrAttendance(models.Model):
                 continue
 
             # Check if already marked as auto_closed
-            if record.note and 'Auto-closed' in record.note:
+            if record.is_auto_closed:
                 record.status = 'auto_closed'
                 continue
 
@@ -120,10 +147,15 @@ class HrAttendance(models.Model):
                 timezone = record.device_id.timezone
 
             # Get shift boundaries for check-in date
-            try:
-                boundaries = shift.get_shift_boundaries(record.check_in.date(), timezone)
-            except Exception as e:
-                _logger.warning(f"Could not calculate shift boundaries: {e}")
+            key = (shift.id, record.check_in.date(), timezone)
+            if key not in boundaries_cache:
+                try:
+                    boundaries_cache[key] = shift.get_shift_boundaries(key[1], timezone)
+                except Exception as e:
+                    _logger.warning(f"Could not calculate shift boundaries: {e}")
+                    boundaries_cache[key] = None
+            boundaries = boundaries_cache[key]
+            if boundaries is None:
                 record.status = 'on_time'
                 continue
 
@@ -133,15 +165,15 @@ class HrAttendance(models.Model):
             # ===========================================
             # CHECK LATE (arrived after late_threshold)
             # ===========================================
-            if record.check_in > boundaries['late_threshold']:
-                diff_seconds = (record.check_in - boundaries['shift_start']).total_seconds()
+            if record.check_in > boundaries.late_threshold:
+                diff_seconds = (record.check_in - boundaries.shift_start).total_seconds()
                 record.late_minutes = int(max(0, diff_seconds / 60))
 
             # ===========================================
             # CHECK EARLY LEAVE (left before early_leave_threshold)
             # ===========================================
-            if record.check_out < boundaries['early_leave_threshold']:
-                diff_seconds = (boundaries['shift_end'] - record.check_out).total_seconds()
+            if record.check_out < boundaries.early_leave_threshold:
+                diff_seconds = (boundaries.shift_end - record.check_out).total_seconds()
                 record.early_leave_minutes = int(max(0, diff_seconds / 60))
 
             # ===========================================
@@ -4,6 +4,10 @@ from odoo import models, fields, api
 class HrEmployee(models.Model):
     _inherit = 'hr.employee'
 
+    # Trigram index (GIN, when pg_trgm is available) for the ilike name
+    # matching done when auto-mapping device users
+    name = fields.Char(index='trigram')
+
     # Device mappings
     device_user_ids = fields.One2many(
         'attendance.device.user',
@@ -23,8 +27,11 @@ class HrEmployee(models.Model):
     )
 
     def _compute_device_user_count(self):
+        counts = dict(self.env['attendance.device.user']._read_group(
+            [('employee_id', 'in', self.ids)], ['employee_id'], ['__count']
+        ))
         for employee in self:
-            employee.device_user_count = len(employee.device_user_ids)
+            employee.device_user_count = counts.get(employee, 0)
 
     def action_view_device_mappings(self):
         self.ensure_one()
@@ -1,7 +1,8 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
-from datetime import timedelta
+from datetime import datetime, timedelta
 import logging
+import re
 
 _logger = logging.getLogger(__name__)
 
@@ -16,7 +17,32 @@ class AttendanceProcessor(models.AbstractModel):
     
     def process_raw_logs(self, device, raw_logs):
         """Process multiple raw logs from device sync."""
-        result = {
+        result = self._new_result(raw_logs)
+
+        if not raw_logs:
+            return result
+
+        new_logs = self._store_raw_logs(device, raw_logs, result)
+        self._process_stored_logs(device, new_logs, result)
+        return result
+
+    def enqueue_raw_logs(self, device, raw_logs):
+        """
+        Store raw logs as pending without processing them.
+        The pending queue is drained by cron_process_pending_logs.
+        """
+        result = self._new_result(raw_logs)
+        result['queued'] = 0
+
+        if not raw_logs:
+            return result
+
+        new_logs = self._store_raw_logs(device, raw_logs, result)
+        result['queued'] = len(new_logs)
+        return result
+
+    def _new_result(self, raw_logs):
+        return {
             'fetched': len(raw_logs),
             'processed': 0,
             'failed': 0,
@@ -24,11 +50,8 @@ class AttendanceProcessor(models.AbstractModel):
             'ignored': 0
         }
 
-        if not raw_logs:
-            return result
-
-        device_users = self._get_device_users_map(device)
-
+    def _store_raw_logs(self, device, raw_logs, result):
+        """Validate, de-duplicate and create pending raw logs. Returns the new logs."""
         dup_threshold = int(self.env['ir.config_parameter'].sudo().get_param(
             'attendance_gateway.duplicate_threshold', 60
         ))
@@ -38,6 +61,13 @@ class AttendanceProcessor(models.AbstractModel):
         except Exception as e: 
             _logger.warning(f"Could not sort logs: {e}")
 
+        # Codes outside the selection are rejected here: the bulk insert skips the ORM check
+        punch_types = dict(self.env['attendance.raw.log']._fields['punch_type'].selection)
+
+        to_insert = []
+        # Last accepted punch per user in this batch, for in-batch near-duplicates
+        last_accepted = {}
+
         for log_data in raw_logs:
             try:
                 device_user_id = str(log_data.get('device_user_id', '')).strip()
@@ -50,21 +80,23 @@ class AttendanceProcessor(models.AbstractModel):
                     result['failed'] += 1
                     continue
 
+                punch_type = str(log_data.get('punch_type', '0'))
+                if punch_type not in punch_types:
+                    _logger.warning(f"Unknown punch type {punch_type!r} from device {device.name}")
+                    result['failed'] += 1
+                    continue
+
                 if isinstance(timestamp, str):
                     timestamp = fields.Datetime.to_datetime(timestamp)
 
-                # Check for exact duplicate
-                existing = self.env['attendance.raw.log'].search([
-                    ('device_id', '=', device.id),
-                    ('device_user_id', '=', device_user_id),
-                    ('timestamp', '=', timestamp)
-                ], limit=1)
-
-                if existing:
+                # Check for near-duplicate in this batch (logs are sorted by time)
+                previous = last_accepted.get(device_user_id)
+                if previous and (timestamp - previous).total_seconds() <= dup_threshold:
                     result['duplicates'] += 1
                     continue
 
-                # Check for near-duplicate
+                # Check for near-duplicate already stored.
+                # Exact duplicates are dropped by the insert itself.
                 time_start = timestamp - timedelta(seconds=dup_threshold)
                 time_end = timestamp + timedelta(seconds=dup_threshold)
 
@@ -80,17 +112,29 @@ class AttendanceProcessor(models.AbstractModel):
                     result['duplicates'] += 1
                     continue
 
-                device_punch_type = str(log_data.get('punch_type', '0'))
-
-                raw_log = self.env['attendance.raw.log'].create({
-                    'device_id': device.id,
+                to_insert.append({
                     'device_user_id': device_user_id,
                     'timestamp': timestamp,
-                    'punch_type': device_punch_type,
+                    'punch_type': punch_type,
                     'raw_data': str(log_data.get('raw_data', {})),
-                    'state': 'pending'
                 })
+                last_accepted[device_user_id] = timestamp
 
+            except Exception as e:
+                _logger.error(f"Failed to store log: {e}", exc_info=True)
+                result['failed'] += 1
+
+        new_logs = self.env['attendance.raw.log']._insert_ignore_duplicates(device, to_insert)
+        result['duplicates'] += len(to_insert) - len(new_logs)
+        return new_logs
+
+    def _process_stored_logs(self, device, raw_logs, result):
+        """Run pending raw logs of one device through the punch pipeline, in order"""
+        device_users = self._get_device_users_map(device)
+
+        for raw_log in raw_logs:
+            try:
+                device_user_id = raw_log.device_user_id
                 device_user = device_users.get(device_user_id)
                 process_result = self._process_punch(raw_log, device_user, device)
 
@@ -113,6 +157,24 @@ class AttendanceProcessor(models.AbstractModel):
         """Public method to reprocess a single log"""
         return self._process_punch(raw_log, device_user, raw_log.device_id)
 
+    def process_logs(self, raw_logs):
+        """
+        Reprocess stored raw logs of any devices, oldest first per device.
+        Device user mappings are loaded once per device.
+
+        Returns: dict {raw log id: result of _process_punch}
+        """
+        results = {}
+        for device, device_logs in raw_logs.grouped('device_id').items():
+            device_users = self._get_device_users_map(device)
+            for raw_log in device_logs.sorted(lambda l: (l.timestamp, l.id)):
+                device_user_id = raw_log.device_user_id
+                process_result = self._process_punch(raw_log, device_users.get(device_user_id), device)
+                if process_result.get('device_user') and device_user_id not in device_users:
+                    device_users[device_user_id] = process_result['device_user']
+                results[raw_log.id] = process_result
+        return results
+
     # ===========================================
     # CORE PROCESSING LOGIC
     # ===========================================
@@ -130,37 +192,40 @@ class AttendanceProcessor(models.AbstractModel):
 
         try:
             # STEP 1: Find/Create Employee Mapping
-            if not device_user:
-                device_user = self.env['attendance.device.user'].get_or_create_mapping(
-                    device, raw_log.device_user_id
-                )
-                result['device_user'] = device_user
+            # Savepoint so a mapping the database rejects (employee already
+            # mapped on this device) only fails this punch
+            with self.env.cr.savepoint():
+                if not device_user:
+                    device_user = self.env['attendance.device.user'].get_or_create_mapping(
+                        device, raw_log.device_user_id
+                    )
+                    result['device_user'] = device_user
 
-            if not device_user or not device_user.employee_id:
-                employee = self._find_employee_by_badge(device, raw_log.device_user_id)
+                if not device_user or not device_user.employee_id:
+                    employee = self._find_employee_by_badge(device, raw_log.device_user_id)
                 
-                if employee:
-                    if device_user: 
-                        device_user.write({
-                            'employee_id': employee.id,
-                            'mapping_confidence': 'high',
-                            'mapping_method': 'Auto-matched during sync'
-                        })
+                    if employee:
+                        if device_user: 
+                            device_user.write({
+                                'employee_id': employee.id,
+                                'mapping_confidence': 'high',
+                                'mapping_method': 'Auto-matched during sync'
+                            })
+                        else:
+                            device_user = self.env['attendance.device.user'].create({
+                                'device_id': device.id,
+                                'device_user_id': raw_log.device_user_id,
+                                'employee_id': employee.id,
+                                'mapping_confidence': 'high',
+                                'mapping_method': 'Auto-created during sync'
+                            })
+                        result['device_user'] = device_user
                     else:
-                        device_user = self.env['attendance.device.user'].create({
-                            'device_id': device.id,
-                            'device_user_id': raw_log.device_user_id,
-                            'employee_id': employee.id,
-                            'mapping_confidence': 'high',
-                            'mapping_method': 'Auto-created during sync'
+                        raw_log.write({
+                            'state': 'error',
+                            'message': f'No employee found for ID: {raw_log.device_user_id}'
                         })
-                    result['device_user'] = device_user
-                else:
-                    raw_log.write({
-                        'state': 'error',
-                        'message': f'No employee found for ID: {raw_log.device_user_id}'
-                    })
-                    return result
+                        return result
 
             employee = device_user.employee_id
             raw_log.write({'employee_id': employee.id})
@@ -231,11 +296,9 @@ class AttendanceProcessor(models.AbstractModel):
 
             open_attendance.write({
                 'check_out': close_time,
+                'is_auto_closed': True,
                 'note': f"{open_attendance.note or ''}\n⚠️ Auto-closed: No checkout after {auto_close_hours}h".strip()
             })
-            
-            # Trigger status recalculation
-            open_attendance._compute_status()
 
             _logger.info(
                 f"⚠️ AUTO-CLOSED stale attendance for {employee.name}. "
@@ -303,7 +366,6 @@ class AttendanceProcessor(models.AbstractModel):
 
         # B2: Normal → CHECK OUT (stale case already handled by _auto_close_stale_attendance)
         open_attendance.write({'check_out': timestamp})
-        open_attendance._compute_status()
 
         raw_log.write({
             'state': 'processed',
@@ -373,14 +435,7 @@ class AttendanceProcessor(models.AbstractModel):
 
     def _get_slot_punch_type(self, shift, timestamp, timezone):
         """Get punch type from matching slot"""
-        if not shift.punch_slot_ids:
-            return None
-
-        for slot in shift.punch_slot_ids.filtered(lambda s: s.active).sorted('sequence'):
-            if slot.is_time_in_window(timestamp, timezone):
-                return slot.punch_type
-
-        return None
+        return shift._get_active_slots().find_matching_slot(timestamp, timezone).punch_type or None
 
     # ===========================================
     # SLOT MODE: Individual Punch Handlers
@@ -443,7 +498,6 @@ class AttendanceProcessor(models.AbstractModel):
             return result
 
         open_attendance.write({'check_out': timestamp})
-        open_attendance._compute_status()
 
         raw_log.write({
             'state': 'processed',
@@ -526,11 +580,9 @@ class AttendanceProcessor(models.AbstractModel):
         break_duration = 0
         try:
             # Find the last Break Out time
-            import re
             break_out_times = re.findall(r'Break Out: (\d{2}:\d{2})', note)
             if break_out_times:
                 last_break_out = break_out_times[-1]
-                from datetime import datetime
                 break_out_time = datetime.strptime(last_break_out, '%H:%M').time()
                 break_in_time = timestamp.time()
                 
@@ -662,23 +714,10 @@ class AttendanceProcessor(models.AbstractModel):
 
     def _find_employee_by_badge(self, device, badge_id):
         """Find employee by badge ID across multiple fields"""
-        Employee = self.env['hr.employee']
-        employee_fields = Employee._fields
-        
-        company_domain = []
-        if device.company_id:
-            company_domain = [('company_id', 'in', [device.company_id.id, False])]
-
-        for field_name in ['identification_id', 'barcode', 'pin']: 
-            if field_name in employee_fields:
-                employee = Employee.search(
-                    [(field_name, '=', badge_id)] + company_domain,
-                    limit=1
-                )
-                if employee:
-                    return employee
-
-        return None
+        employee, _method = self.env['attendance.device.user']._find_employee_by_badge(
+            badge_id, device.company_id.id or None
+        )
+        return employee
 
     # ===========================================
     # SCHEDULED AUTO-CLOSE (Called by Cron)
@@ -716,9 +755,9 @@ class AttendanceProcessor(models.AbstractModel):
                 
                 attendance.write({
                     'check_out': close_time,
+                    'is_auto_closed': True,
                     'note': f"{attendance.note or ''}\n⚠️ Auto-closed by system: No checkout after {auto_close_hours}h".strip()
                 })
-                attendance._compute_status()
                 
                 _logger.info(f"Cron auto-closed attendance for {attendance.employee_id.name}")
                 closed_count += 1
@@ -726,4 +765,28 @@ class AttendanceProcessor(models.AbstractModel):
         if closed_count: 
             _logger.info(f"Cron job auto-closed {closed_count} stale attendances")
 
-        return closed_count
\ No newline at end of file
+        return closed_count
+
+    # ===========================================
+    # QUEUED PUNCHES (Called by Cron)
+    # ===========================================
+
+    @api.model
+    def cron_process_pending_logs(self, limit=5000):
+        """
+        Process raw logs queued by the webhook endpoint.
+        Logs are handled per device in timestamp order.
+        """
+        pending = self.env['attendance.raw.log'].search(
+            [('state', '=', 'pending')], order='timestamp asc, id asc', limit=limit
+        )
+        if not pending:
+            return 0
+
+        result = self._new_result(pending)
+        for device in pending.device_id:
+            device_logs = pending.filtered(lambda l: l.device_id == device)
+            self._process_stored_logs(device, device_logs, result)
+
+        _logger.info(f"Processed {len(pending)} queued punches: {result}")
+        return len(pending)
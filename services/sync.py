@@ -0,0 +1,57 @@
+from odoo import api, _
+from odoo.modules.registry import Registry
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+import logging
+
+_logger = logging.getLogger(__name__)
+
+MAX_SYNC_WORKERS = 8
+
+
+def sync_devices(devices, max_workers=MAX_SYNC_WORKERS):
+    """
+    Pull attendance from several devices concurrently.
+
+    Device I/O (sockets, HTTP) releases the GIL, so each device syncs in its
+    own thread with its own cursor, committed when that device is done: a
+    slow or failing device neither blocks nor rolls back the others.
+
+    Returns: dict {device_id: sync result, or None if the sync failed}
+    """
+    if len(devices) <= 1 or getattr(threading.current_thread(), 'testing', False):
+        return {device.id: _sync_device(device) for device in devices}
+
+    env = devices.env
+    dbname, uid, context = env.cr.dbname, env.uid, dict(env.context)
+    results = {}
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(devices))) as executor:
+        futures = {
+            executor.submit(_sync_in_new_cursor, dbname, uid, context, device.id): device
+            for device in devices
+        }
+        for future in as_completed(futures):
+            device = futures[future]
+            try:
+                results[device.id] = future.result()
+            except Exception as e:
+                _logger.error(f"Sync worker failed for {device.name}: {e}")
+                results[device.id] = None
+
+    return results
+
+
+def _sync_in_new_cursor(dbname, uid, context, device_id):
+    with Registry(dbname).cursor() as cr:
+        env = api.Environment(cr, uid, context)
+        return _sync_device(env['attendance.device'].browse(device_id))
+
+
+def _sync_device(device):
+    try:
+        return device._sync_attendance_logs()
+    except Exception as e:
+        _logger.error(f"Sync failed for {device.name}: {e}")
+        device.message_post(body=_("Sync failed: %s") % str(e))
+        return None
\ No newline at end of file
@@ -10,4 +10,4 @@ class DeviceTestWizard(models.TransientModel):
     def action_test(self):
         self.ensure_one()
         result = self.device_id.action_test_connection()
-        self.test_result = result
\ No newline at end of file
+        self.test_result = result['params']['message']
\ No newline at end of file